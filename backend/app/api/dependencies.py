@@ -10,12 +10,21 @@ from pydantic import BaseModel
 from functools import lru_cache
 
 from app.services.supabase_client import supabase, get_supabase
+from app.services.supabase_rest import SupabaseRESTClient
 
 def get_supabase_client():
-    """Dependency to get Supabase client"""
+    """
+    Dependency to get Supabase client
+    Renvoie le singleton du process (SupabaseClient): aucun client HTTP n'est recréé par requête
+    """
     return get_supabase()
 
 
+def get_supabase_rest():
+    """Dependency to get the pooled async Supabase REST client"""
+    return SupabaseRESTClient.get_client()
+
+
 class CurrentUser(BaseModel):
     """Model for the current authenticated user"""
     id: UUID
@@ -9,11 +9,15 @@ from loguru import logger
 from app.models.note import NoteCreate, NoteSync, NoteResponse, NoteUpdate, NoteEvent
 from app.services.supabase_client import supabase
 from app.services.event_logger import log_note_event
+from app.services.cache import invalidate_unified_feed
 from app.workers.tasks import process_note_task, reprocess_cluster_on_moderation_task
 from app.api.dependencies import CurrentUser, get_current_user, require_board_or_owner, get_optional_user
 
 router = APIRouter()
 
+# Notes analysées par l'IA (visibles); 'draft' / 'processing' sont exclues
+ACTIONED_STATUSES = ("processed", "review", "approved", "refused", "archived")
+
 @router.get("/", response_model=List[NoteResponse])
 def get_notes(
     current_user: CurrentUser = Depends(get_current_user),
@@ -197,6 +201,7 @@ def update_note(
             raise HTTPException(status_code=500, detail="Note update returned no data")
         
         updated_note = response.data[0]
+        invalidate_unified_feed(str(current_user.organization_id))
         
         # Log board moderation events
         if update.status == "processed":
@@ -327,6 +332,7 @@ def delete_note(
             raise HTTPException(status_code=404, detail="Note not found")
             
         supabase.table("notes").delete().eq("id", str(note_id)).execute()
+        invalidate_unified_feed(str(current_user.organization_id))
         
         logger.info(f"Note deleted: {note_id} by {current_user.id}")
         
@@ -373,7 +379,7 @@ def get_user_notes(
             clusters(id, title, pillar_id, note_count, pillars(id, name))
             """
         ).eq("user_id", user_id).eq("organization_id", str(current_user.organization_id)).in_(
-            "status", ["processed", "review", "approved", "refused", "archived"]
+            "status", ACTIONED_STATUSES
         )
             
         response = query.order("created_at", desc=True).execute()
@@ -2,19 +2,35 @@
 Social Feed API Routes
 Endpoints pour le feed social avec pagination par curseur et filtrage par tag
 """
+import asyncio
+import base64
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
 from uuid import UUID, uuid4
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, UploadFile, File
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field, validator
 from loguru import logger
 
-from app.api.dependencies import get_current_user, get_supabase_client
+from app.api.dependencies import get_current_user, get_supabase_client, get_supabase_rest
+from app.services.cache import cache_get, cache_set, invalidate_unified_feed
+from app.services.virality_listener import ViralityListener
 from app.workers.social_feed_tasks import trigger_virality_recalculation
 
 
 router = APIRouter(prefix="/feed", tags=["Social Feed"])
 
 
+def _schedule_virality(background_tasks: BackgroundTasks, post_id: str):
+    """
+    Recalcul de viralité après un engagement: avec DATABASE_URL, les triggers
+    NOTIFY + ViralityListener s'en chargent; sinon recalcul Celery (debounce)
+    planifié après l'envoi de la réponse
+    """
+    if not ViralityListener.enabled():
+        background_tasks.add_task(trigger_virality_recalculation, post_id)
+
+
 # ============================================
 # PYDANTIC MODELS
 # ============================================
@@ -69,6 +85,9 @@ class MediaUploadResponse(BaseModel):
     message: str
 
 
+# Trending tags: même réponse pour toute une organisation, trend_score évolue lentement
+TRENDING_TAGS_CACHE_TTL = 45  # secondes
+
 # Allowed image MIME types for post media
 ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
@@ -154,6 +173,7 @@ def upload_post_media(
 @router.post("/posts", response_model=PostResponse)
 def create_post(
     request: CreatePostRequest,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     supabase = Depends(get_supabase_client)
 ):
@@ -190,9 +210,8 @@ def create_post(
         if request.tag_names and len(request.tag_names) > 0:
             _associate_tags_to_post(post_id, organization_id, request.tag_names, supabase)
         
-        # Trigger virality calculation (async)
-        trigger_virality_recalculation(post_id)
-        
+        _schedule_virality(background_tasks, post_id)
+        invalidate_unified_feed(organization_id)
         logger.info(f"✅ Post created: {post_id} by user {user_id}")
         
         return PostResponse(**post)
@@ -217,7 +236,9 @@ def get_scheduled_posts(
         user_id = str(current_user.id)
         
         response = supabase.table("posts").select(
-            "*, users(first_name, last_name, email, avatar_url)"
+            "id, user_id, organization_id, content, media_urls, post_type, status, scheduled_at, "
+            "likes_count, comments_count, shares_count, saves_count, virality_score, virality_level, created_at, "
+            "users(first_name, last_name, email, avatar_url)"
         ).eq("user_id", user_id).eq("status", "scheduled").order("scheduled_at", desc=False).execute()
         
         if not response.data:
@@ -310,14 +331,15 @@ def delete_post(
     try:
         user_id = str(current_user.id)
         # Verify ownership
-        post_resp = supabase.table("posts").select("user_id").eq("id", post_id).single().execute()
+        post_resp = supabase.table("posts").select("user_id").eq("id", post_id).limit(1).execute()
         if not post_resp.data:
              raise HTTPException(status_code=404, detail="Post not found")
              
-        if post_resp.data["user_id"] != user_id:
+        if post_resp.data[0]["user_id"] != user_id:
             raise HTTPException(status_code=403, detail="Not authorized")
             
         supabase.table("posts").delete().eq("id", post_id).execute()
+        invalidate_unified_feed(str(current_user.organization_id))
         return {"status": "success"}
     except HTTPException:
         raise
@@ -346,11 +368,11 @@ def update_post(
     try:
         user_id = str(current_user.id)
         # Verify ownership
-        post_resp = supabase.table("posts").select("user_id").eq("id", post_id).single().execute()
+        post_resp = supabase.table("posts").select("user_id").eq("id", post_id).limit(1).execute()
         if not post_resp.data:
              raise HTTPException(status_code=404, detail="Post not found")
 
-        if post_resp.data["user_id"] != user_id:
+        if post_resp.data[0]["user_id"] != user_id:
             raise HTTPException(status_code=403, detail="Not authorized")
             
         # Pydantic v2: model_dump, v1: dict
@@ -361,6 +383,7 @@ def update_post(
 
         if updates:
             supabase.table("posts").update(updates).eq("id", post_id).execute()
+            invalidate_unified_feed(str(current_user.organization_id))
             
         return {"status": "success"}
     except HTTPException:
@@ -375,11 +398,11 @@ def update_post(
 # ============================================
 
 @router.get("/", response_model=FeedResponse)
-def get_social_feed(
+async def get_social_feed(
     limit: int = Query(default=20, ge=1, le=100),
     last_seen_score: Optional[float] = Query(default=None, description="Cursor pagination: last virality_score seen"),
     current_user: dict = Depends(get_current_user),
-    supabase = Depends(get_supabase_client)
+    rest = Depends(get_supabase_rest)
 ):
     """
     Récupère le feed social avec pagination par curseur
@@ -397,7 +420,7 @@ def get_social_feed(
         user_id = str(current_user.id)
         
         # Call RPC function pour performance optimale
-        feed_response = supabase.rpc(
+        posts_data = await rest.rpc(
             "get_social_feed_optimized",
             {
                 "p_user_org_id": organization_id,
@@ -405,9 +428,7 @@ def get_social_feed(
                 "p_last_seen_score": last_seen_score,
                 "p_current_user_id": user_id
             }
-        ).execute()
-        
-        posts_data = feed_response.data or []
+        ) or []
         
         # Check if there are more results
         has_more = len(posts_data) > limit
@@ -419,11 +440,12 @@ def get_social_feed(
         if has_more and len(posts_data) > 0:
             next_cursor = posts_data[-1]["virality_score"]
         
-        return FeedResponse(
-            posts=posts_data,
-            next_cursor=next_cursor,
-            has_more=has_more
-        )
+        # Sortie RPC de forme connue: pas de revalidation Pydantic post par post
+        return ORJSONResponse({
+            "posts": posts_data,
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        })
         
     except Exception as e:
         logger.error(f"❌ Error fetching social feed: {e}")
@@ -435,12 +457,12 @@ def get_social_feed(
 # ============================================
 
 @router.get("/tag/{tag_name}", response_model=FeedResponse)
-def get_feed_by_tag(
+async def get_feed_by_tag(
     tag_name: str,
     limit: int = Query(default=20, ge=1, le=100),
     last_seen_score: Optional[float] = Query(default=None),
     current_user: dict = Depends(get_current_user),
-    supabase = Depends(get_supabase_client)
+    rest = Depends(get_supabase_rest)
 ):
     """
     Récupère le feed filtré par tag avec la logique "Local OR Viral"
@@ -450,7 +472,7 @@ def get_feed_by_tag(
         user_id = str(current_user.id)
         
         # Call RPC function
-        feed_response = supabase.rpc(
+        posts_data = await rest.rpc(
             "get_feed_by_tag_optimized",
             {
                 "p_user_org_id": organization_id,
@@ -459,9 +481,7 @@ def get_feed_by_tag(
                 "p_last_seen_score": last_seen_score,
                 "p_current_user_id": user_id
             }
-        ).execute()
-        
-        posts_data = feed_response.data or []
+        ) or []
         
         # Check if there are more results
         has_more = len(posts_data) > limit
@@ -473,11 +493,12 @@ def get_feed_by_tag(
         if has_more and len(posts_data) > 0:
             next_cursor = posts_data[-1]["virality_score"]
         
-        return FeedResponse(
-            posts=posts_data,
-            next_cursor=next_cursor,
-            has_more=has_more
-        )
+        # Sortie RPC de forme connue: pas de revalidation Pydantic post par post
+        return ORJSONResponse({
+            "posts": posts_data,
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        })
         
     except Exception as e:
         logger.error(f"❌ Error fetching feed by tag '{tag_name}': {e}")
@@ -491,6 +512,7 @@ def get_feed_by_tag(
 @router.post("/posts/{post_id}/like", response_model=EngagementResponse)
 def toggle_like_post(
     post_id: str,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     supabase = Depends(get_supabase_client)
 ):
@@ -500,16 +522,12 @@ def toggle_like_post(
     try:
         user_id = str(current_user.id)
         
-        # Check if already liked
-        existing_like = supabase.table("post_likes").select("id").eq(
+        # DELETE d'abord: une ligne supprimée = unliked, sinon on insère
+        deleted = supabase.table("post_likes").delete().eq(
             "post_id", post_id
         ).eq("user_id", user_id).execute()
         
-        if existing_like.data and len(existing_like.data) > 0:
-            # Unlike
-            supabase.table("post_likes").delete().eq(
-                "post_id", post_id
-            ).eq("user_id", user_id).execute()
+        if deleted.data:
             action = "unliked"
         else:
             # Like
@@ -523,9 +541,8 @@ def toggle_like_post(
         post = supabase.table("posts").select("likes_count").eq("id", post_id).single().execute()
         new_count = post.data["likes_count"] if post.data else 0
         
-        # Trigger virality recalculation
-        trigger_virality_recalculation(post_id)
-        
+        _schedule_virality(background_tasks, post_id)
+        invalidate_unified_feed(str(current_user.organization_id))
         return EngagementResponse(success=True, action=action, new_count=new_count)
         
     except Exception as e:
@@ -540,6 +557,7 @@ def toggle_like_post(
 @router.post("/posts/{post_id}/save", response_model=EngagementResponse)
 def toggle_save_post(
     post_id: str,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     supabase = Depends(get_supabase_client)
 ):
@@ -549,16 +567,12 @@ def toggle_save_post(
     try:
         user_id = str(current_user.id)
         
-        # Check if already saved
-        existing_save = supabase.table("post_saves").select("id").eq(
+        # DELETE d'abord: une ligne supprimée = unsaved, sinon on insère
+        deleted = supabase.table("post_saves").delete().eq(
             "post_id", post_id
         ).eq("user_id", user_id).execute()
         
-        if existing_save.data and len(existing_save.data) > 0:
-            # Unsave
-            supabase.table("post_saves").delete().eq(
-                "post_id", post_id
-            ).eq("user_id", user_id).execute()
+        if deleted.data:
             action = "unsaved"
         else:
             # Save
@@ -572,9 +586,9 @@ def toggle_save_post(
         post = supabase.table("posts").select("saves_count").eq("id", post_id).single().execute()
         new_count = post.data["saves_count"] if post.data else 0
         
-        # Trigger virality recalculation (Save vaut 10 points!)
-        trigger_virality_recalculation(post_id)
-        
+        # Save vaut 10 points!
+        _schedule_virality(background_tasks, post_id)
+        invalidate_unified_feed(str(current_user.organization_id))
         return EngagementResponse(success=True, action=action, new_count=new_count)
         
     except Exception as e:
@@ -587,10 +601,10 @@ def toggle_save_post(
 # ============================================
 
 @router.get("/posts/{post_id}")
-def get_post_by_id(
+async def get_post_by_id(
     post_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase = Depends(get_supabase_client)
+    rest = Depends(get_supabase_rest)
 ):
     """
     Récupère un post par son ID avec toutes les infos d'engagement
@@ -599,60 +613,20 @@ def get_post_by_id(
         user_id = str(current_user.id)
         organization_id = str(current_user.organization_id)
         
-        # Fetch post with user info
-        post_response = supabase.table("posts").select(
-            "*, users(id, email, first_name, last_name, avatar_url)"
-        ).eq("id", post_id).eq("organization_id", organization_id).single().execute()
+        # Post + user info + is_liked/is_saved en un seul aller-retour
+        post = await rest.rpc(
+            "get_post_detail",
+            {
+                "p_post_id": post_id,
+                "p_user_id": user_id,
+                "p_org_id": organization_id
+            }
+        )
         
-        if not post_response.data:
+        if not post:
             raise HTTPException(status_code=404, detail="Post not found")
         
-        post = post_response.data
-        
-        # Check if user has liked (non-blocking)
-        is_liked = False
-        try:
-            like_check = supabase.table("post_likes").select("id").eq(
-                "post_id", post_id
-            ).eq("user_id", user_id).execute()
-            is_liked = bool(like_check.data and len(like_check.data) > 0)
-        except Exception:
-            pass
-        
-        # Check if user has saved (non-blocking)
-        is_saved = False
-        try:
-            save_check = supabase.table("post_saves").select("id").eq(
-                "post_id", post_id
-            ).eq("user_id", user_id).execute()
-            is_saved = bool(save_check.data and len(save_check.data) > 0)
-        except Exception:
-            pass
-        
-        user_info = post.get("users") or {}
-        
-        return {
-            "id": post["id"],
-            "content": post["content"],
-            "post_type": post["post_type"],
-            "media_urls": post.get("media_urls"),
-            "user_id": post["user_id"],
-            "user_info": {
-                "id": user_info.get("id"),
-                "email": user_info.get("email"),
-                "first_name": user_info.get("first_name"),
-                "last_name": user_info.get("last_name"),
-                "avatar_url": user_info.get("avatar_url"),
-            },
-            "likes_count": post.get("likes_count", 0),
-            "comments_count": post.get("comments_count", 0),
-            "saves_count": post.get("saves_count", 0),
-            "shares_count": post.get("shares_count", 0),
-            "is_liked": is_liked,
-            "is_saved": is_saved,
-            "created_at": post["created_at"],
-            "updated_at": post["updated_at"],
-        }
+        return post
         
     except HTTPException:
         raise
@@ -681,11 +655,19 @@ def get_trending_tags(
     try:
         organization_id = str(current_user.organization_id)
         
-        tags_response = supabase.table("tags").select("*").eq(
+        cache_key = f"trending:{organization_id}:{limit}"
+        cached = cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        tags_response = supabase.table("tags").select("id, name, trend_score, organization_id").eq(
             "organization_id", organization_id
         ).order("trend_score", desc=True).limit(limit).execute()
         
-        return {"tags": tags_response.data or []}
+        result = {"tags": tags_response.data or []}
+        cache_set(cache_key, result, TRENDING_TAGS_CACHE_TTL)
+        
+        return result
         
     except Exception as e:
         logger.error(f"❌ Error fetching trending tags: {e}")
@@ -771,6 +753,32 @@ class CommentsListResponse(BaseModel):
     comments: List[CommentResponse]
     total_count: int
     has_more: bool
+    next_cursor: Optional[str] = None  # Curseur opaque (base64 urlsafe de "created_at|id")
+
+
+def _parse_comment_cursor(cursor: Optional[str]):
+    """
+    Décode un curseur keyset opaque (base64 urlsafe de "created_at|id") en paramètres RPC
+    """
+    if not cursor:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        after_created_at, after_id = raw.split("|", 1)
+        UUID(after_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return after_created_at, after_id
+
+
+def _comment_cursor(comment: Dict[str, Any]) -> str:
+    """
+    Curseur keyset pointant après ce commentaire
+    Encodé en base64 urlsafe sans padding: le '+' du fuseau horaire n'arrive pas
+    en espace si le client n'encode pas l'URL
+    """
+    raw = f"{comment['created_at']}|{comment['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
 
 
 # ============================================
@@ -781,6 +789,7 @@ class CommentsListResponse(BaseModel):
 def create_comment(
     post_id: str,
     request: CreateCommentRequest,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     supabase = Depends(get_supabase_client)
 ):
@@ -794,19 +803,6 @@ def create_comment(
         if not request.content.strip() and not request.media_url and not request.poll_data:
             raise HTTPException(status_code=400, detail="Comment must have content, an image, or a poll")
         
-        # Vérifier que le post existe
-        post = supabase.table("posts").select("id").eq("id", post_id).execute()
-        if not post.data or len(post.data) == 0:
-            raise HTTPException(status_code=404, detail="Post not found")
-        
-        # Si c'est une réponse, vérifier que le parent existe
-        if request.parent_comment_id:
-            parent = supabase.table("post_comments").select("id").eq(
-                "id", request.parent_comment_id
-            ).execute()
-            if not parent.data or len(parent.data) == 0:
-                raise HTTPException(status_code=404, detail="Parent comment not found")
-        
         # Prepare poll_data with initial votes structure if provided
         poll_data_to_save = None
         if request.poll_data:
@@ -821,42 +817,34 @@ def create_comment(
                 "total_votes": 0
             }
         
-        # Créer le commentaire
-        comment_data = {
-            "post_id": post_id,
-            "user_id": user_id,
-            "content": request.content,
-            "parent_comment_id": request.parent_comment_id,
-            "media_url": request.media_url,
-            "poll_data": poll_data_to_save
-        }
-        
-        comment_response = supabase.table("post_comments").insert(comment_data).execute()
-        
-        if not comment_response.data:
-            raise HTTPException(status_code=500, detail="Failed to create comment")
-        
-        comment = comment_response.data[0]
+        # Créer le commentaire (vérification post/parent + user_info dans la même RPC)
+        comment_response = supabase.rpc(
+            "create_comment_rpc",
+            {
+                "p_post_id": post_id,
+                "p_user_id": user_id,
+                "p_content": request.content,
+                "p_parent_id": request.parent_comment_id,
+                "p_media_url": request.media_url,
+                "p_poll_data": poll_data_to_save
+            }
+        ).execute()
         
-        # Fetch user info
-        user_response = supabase.table("users").select(
-            "id, email, first_name, last_name, avatar_url"
-        ).eq("id", user_id).single().execute()
+        comment = comment_response.data
         
-        user_info = user_response.data if user_response.data else {}
+        if not comment:
+            # Nothing inserted: the post or the parent comment does not exist
+            post = supabase.table("posts").select("id").eq("id", post_id).execute()
+            if not post.data:
+                raise HTTPException(status_code=404, detail="Post not found")
+            raise HTTPException(status_code=404, detail="Parent comment not found")
         
-        # Trigger virality recalculation
-        trigger_virality_recalculation(post_id)
+        _schedule_virality(background_tasks, post_id)
         
         logger.info(f"✅ Comment created: {comment['id']} on post {post_id}")
         
-        return CommentResponse(
-            **comment,
-            user_info=user_info,
-            likes_count=0,
-            is_liked=False,
-            replies_count=0
-        )
+        # La ligne RPC porte déjà likes_count / replies_count (add_comment_counters.sql)
+        return CommentResponse(**{**comment, "is_liked": False})
         
     except HTTPException:
         raise
@@ -870,48 +858,61 @@ def create_comment(
 # ============================================
 
 @router.get("/posts/{post_id}/comments", response_model=CommentsListResponse)
-def get_post_comments(
+async def get_post_comments(
     post_id: str,
     limit: int = Query(default=20, ge=1, le=100),
-    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Keyset pagination: next_cursor de la page précédente"),
     sort: str = Query(default="recent", pattern="^(recent|oldest)$"),
     current_user: dict = Depends(get_current_user),
-    supabase = Depends(get_supabase_client)
+    rest = Depends(get_supabase_rest)
 ):
     """
     Récupère les commentaires racines d'un post (avec réponses imbriquées)
+    
+    **Pagination:**
+    - Utilisez `cursor` (= `next_cursor` de la réponse précédente) pour charger la page suivante
+    - Les commentaires sont triés par `(created_at, id)`
     """
     try:
         user_id = str(current_user.id)
+        after_created_at, after_id = _parse_comment_cursor(cursor)
+        
+        # Page de commentaires + total en parallèle (requêtes indépendantes)
+        comments_data, total_count = await asyncio.gather(
+            rest.rpc(
+                "get_comments_with_replies",
+                {
+                    "p_post_id": post_id,
+                    "p_current_user_id": user_id,
+                    "p_limit": limit + 1,  # +1 pour détecter s'il y a plus de résultats
+                    "p_after_created_at": after_created_at,
+                    "p_after_id": after_id,
+                    "p_sort": sort
+                }
+            ),
+            rest.count(
+                "post_comments",
+                {"post_id": f"eq.{post_id}", "parent_comment_id": "is.null"}
+            )
+        )
+        comments_data = comments_data or []
         
-        # Get comments via RPC
-        comments_response = supabase.rpc(
-            "get_comments_with_replies",
-            {
-                "p_post_id": post_id,
-                "p_current_user_id": user_id,
-                "p_limit": limit,
-                "p_offset": offset
-            }
-        ).execute()
-        
-        comments_data = comments_response.data or []
-        
-        # We need total count separately or we approximate
-        # For full correctness we can query total count
-        count_response = supabase.table("post_comments").select(
-            "id", count="exact"
-        ).eq("post_id", post_id).is_("parent_comment_id", "null").execute()
-        total_count = count_response.count or 0
+        has_more = len(comments_data) > limit
+        if has_more:
+            comments_data = comments_data[:limit]
         
-        has_more = (offset + len(comments_data)) < total_count
+        next_cursor = _comment_cursor(comments_data[-1]) if has_more else None
         
-        return CommentsListResponse(
-            comments=comments_data,
-            total_count=total_count,
-            has_more=has_more
-        )
+        # Sortie RPC de forme connue: pas de revalidation Pydantic
+        return ORJSONResponse({
+            "comments": comments_data,
+            "total_count": total_count,
+            "has_more": has_more,
+            "next_cursor": next_cursor
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error fetching comments: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -922,56 +923,144 @@ def get_post_comments(
 # ============================================
 
 @router.get("/comments/{comment_id}/replies", response_model=CommentsListResponse)
-def get_comment_replies(
+async def get_comment_replies(
     comment_id: str,
     limit: int = Query(default=20, ge=1, le=100),
-    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Keyset pagination: next_cursor de la page précédente"),
     current_user: dict = Depends(get_current_user),
-    supabase = Depends(get_supabase_client)
+    rest = Depends(get_supabase_rest)
 ):
     """
     Récupère les réponses d'un commentaire
     """
     try:
         user_id = str(current_user.id)
+        after_created_at, after_id = _parse_comment_cursor(cursor)
+        
+        # Parent (avec replies_count dénormalisé) + page de réponses en parallèle
+        parent, replies_data = await asyncio.gather(
+            rest.select("post_comments", {"select": "id,replies_count", "id": f"eq.{comment_id}"}),
+            rest.rpc(
+                "get_comment_replies_optimized",
+                {
+                    "p_comment_id": comment_id,
+                    "p_current_user_id": user_id,
+                    "p_limit": limit + 1,
+                    "p_after_created_at": after_created_at,
+                    "p_after_id": after_id
+                }
+            )
+        )
         
-        # Verify parent comment exists
-        # Optional: strictly speaking if we just query replies and get empty list it's fine, 
-        # but 404 is better if parent doesn't exist.
-        parent = supabase.table("post_comments").select("id").eq("id", comment_id).execute()
-        if not parent.data:
+        if not parent:
             raise HTTPException(status_code=404, detail="Comment not found")
+        
+        total_count = parent[0].get("replies_count") or 0
+        replies_data = replies_data or []
+        
+        has_more = len(replies_data) > limit
+        if has_more:
+            replies_data = replies_data[:limit]
+        
+        next_cursor = _comment_cursor(replies_data[-1]) if has_more else None
+        
+        # Sortie RPC de forme connue: pas de revalidation Pydantic
+        return ORJSONResponse({
+            "comments": replies_data,
+            "total_count": total_count,
+            "has_more": has_more,
+            "next_cursor": next_cursor
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error fetching replies: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Get replies via RPC
-        replies_response = supabase.rpc(
-            "get_comment_replies_optimized",
-            {
-                "p_comment_id": comment_id,
-                "p_current_user_id": user_id,
-                "p_limit": limit,
-                "p_offset": offset
-            }
-        ).execute()
 
-        replies_data = replies_response.data or []
+# ============================================
+# ENDPOINT 9.5: Get Comment Tree
+# ============================================
+
+def _nest_comment_tree(flat_comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Reconstruit l'arbre à partir de la liste à plat (ordre pré-fixe) renvoyée par get_comment_tree
+    """
+    by_id: Dict[str, Dict[str, Any]] = {}
+    roots: List[Dict[str, Any]] = []
+    for comment in flat_comments:
+        comment["replies"] = []
+        by_id[comment["id"]] = comment
+        parent = by_id.get(comment.get("parent_comment_id"))
+        if parent is not None:
+            parent["replies"].append(comment)
+        else:
+            roots.append(comment)
+    return roots
+
+
+@router.get("/posts/{post_id}/comments/tree", response_model=CommentsListResponse)
+async def get_comment_tree(
+    post_id: str,
+    limit: int = Query(default=20, ge=1, le=100),
+    max_depth: int = Query(default=3, ge=0, le=10),
+    replies_limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="Keyset pagination: next_cursor de la page précédente"),
+    current_user: dict = Depends(get_current_user),
+    rest = Depends(get_supabase_rest)
+):
+    """
+    Récupère l'arbre des commentaires d'un post (racines + réponses jusqu'à `max_depth`)
+    en un seul appel, au lieu d'un appel `/replies` par fil déplié
+    
+    **Pagination:**
+    - `limit` / `cursor` paginent les commentaires racines (plus récents d'abord)
+    - `replies_limit` borne le nombre de réponses par commentaire à chaque niveau
+    """
+    try:
+        user_id = str(current_user.id)
+        after_created_at, after_id = _parse_comment_cursor(cursor)
+        
+        flat_comments, total_count = await asyncio.gather(
+            rest.rpc(
+                "get_comment_tree",
+                {
+                    "p_post_id": post_id,
+                    "p_current_user_id": user_id,
+                    "p_limit": limit + 1,  # +1 pour détecter s'il y a plus de résultats
+                    "p_max_depth": max_depth,
+                    "p_replies_limit": replies_limit,
+                    "p_after_created_at": after_created_at,
+                    "p_after_id": after_id
+                }
+            ),
+            rest.count(
+                "post_comments",
+                {"post_id": f"eq.{post_id}", "parent_comment_id": "is.null"}
+            )
+        )
         
-        # Get total count
-        count_response = supabase.table("post_comments").select(
-            "id", count="exact"
-        ).eq("parent_comment_id", comment_id).execute()
+        comments_data = _nest_comment_tree(flat_comments or [])
         
-        total_count = count_response.count or 0
+        has_more = len(comments_data) > limit
+        if has_more:
+            comments_data = comments_data[:limit]
         
-        has_more = (offset + len(replies_data)) < total_count
+        next_cursor = _comment_cursor(comments_data[-1]) if has_more else None
         
-        return CommentsListResponse(
-            comments=replies_data,
-            total_count=total_count,
-            has_more=has_more
-        )
+        # Sortie RPC de forme connue: pas de revalidation Pydantic
+        return ORJSONResponse({
+            "comments": comments_data,
+            "total_count": total_count,
+            "has_more": has_more,
+            "next_cursor": next_cursor
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ Error fetching replies: {e}")
+        logger.error(f"❌ Error fetching comment tree for post {post_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -991,39 +1080,17 @@ def toggle_like_comment(
     try:
         user_id = str(current_user.id)
         
-        # Vérifier que le commentaire existe
-        comment = supabase.table("post_comments").select("id, post_id").eq(
-            "id", comment_id
-        ).execute()
+        # Existence + toggle + likes_count (maintenu par trigger) en une seule transaction
+        result = supabase.rpc("toggle_comment_like", {
+            "p_comment_id": comment_id,
+            "p_user_id": user_id
+        }).execute()
         
-        if not comment.data or len(comment.data) == 0:
+        if not result.data:
             raise HTTPException(status_code=404, detail="Comment not found")
         
-        # Check if already liked
-        existing = supabase.table("comment_likes").select("id").eq(
-            "comment_id", comment_id
-        ).eq("user_id", user_id).execute()
-        
-        if existing.data and len(existing.data) > 0:
-            # Unlike
-            supabase.table("comment_likes").delete().eq(
-                "comment_id", comment_id
-            ).eq("user_id", user_id).execute()
-            action = "unliked"
-        else:
-            # Like
-            supabase.table("comment_likes").insert({
-                "comment_id": comment_id,
-                "user_id": user_id
-            }).execute()
-            action = "liked"
-        
-        # Get updated count
-        count_response = supabase.table("comment_likes").select(
-            "id", count="exact"
-        ).eq("comment_id", comment_id).execute()
-        
-        new_count = count_response.count or 0
+        action = result.data["action"]
+        new_count = result.data["new_count"]
         
         logger.info(f"✅ Comment {action}: {comment_id} by user {user_id}")
         
@@ -1043,6 +1110,7 @@ def toggle_like_comment(
 @router.delete("/comments/{comment_id}")
 def delete_comment(
     comment_id: str,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     supabase = Depends(get_supabase_client)
 ):
@@ -1067,9 +1135,7 @@ def delete_comment(
         # Delete (CASCADE will delete replies too)
         supabase.table("post_comments").delete().eq("id", comment_id).execute()
         
-        # Trigger virality recalculation
-        post_id = comment.data[0]["post_id"]
-        trigger_virality_recalculation(post_id)
+        _schedule_virality(background_tasks, comment.data[0]["post_id"])
         
         logger.info(f"✅ Comment deleted: {comment_id}")
         
@@ -1108,41 +1174,36 @@ def vote_comment_poll(
     try:
         user_id = str(current_user.id)
         
-        # Fetch the comment
-        comment_response = supabase.table("post_comments").select(
-            "id, poll_data"
-        ).eq("id", comment_id).single().execute()
+        # Atomic vote: jsonb_set UPDATE guarded by "user not in voter_ids"
+        vote_response = supabase.rpc(
+            "vote_comment_poll",
+            {
+                "p_comment_id": comment_id,
+                "p_user_id": user_id,
+                "p_option_index": request.option_index
+            }
+        ).execute()
         
-        if not comment_response.data:
-            raise HTTPException(status_code=404, detail="Comment not found")
+        poll_data = vote_response.data
         
-        poll_data = comment_response.data.get("poll_data")
         if not poll_data:
-            raise HTTPException(status_code=400, detail="This comment has no poll")
-        
-        # Check if user already voted
-        if user_id in poll_data.get("voter_ids", []):
-            raise HTTPException(status_code=400, detail="You have already voted on this poll")
-        
-        # Validate option index
-        options = poll_data.get("options", [])
-        if request.option_index < 0 or request.option_index >= len(options):
+            # Error path only: find out why the vote was rejected
+            comment_response = supabase.table("post_comments").select(
+                "id, poll_data"
+            ).eq("id", comment_id).execute()
+            
+            if not comment_response.data:
+                raise HTTPException(status_code=404, detail="Comment not found")
+            
+            existing_poll = comment_response.data[0].get("poll_data")
+            if not existing_poll:
+                raise HTTPException(status_code=400, detail="This comment has no poll")
+            
+            if user_id in existing_poll.get("voter_ids", []):
+                raise HTTPException(status_code=400, detail="You have already voted on this poll")
+            
             raise HTTPException(status_code=400, detail="Invalid option index")
         
-        # Update the poll data
-        options[request.option_index]["votes"] = options[request.option_index].get("votes", 0) + 1
-        poll_data["options"] = options
-        poll_data["voter_ids"] = poll_data.get("voter_ids", []) + [user_id]
-        poll_data["total_votes"] = poll_data.get("total_votes", 0) + 1
-        
-        # Save updated poll data
-        update_response = supabase.table("post_comments").update({
-            "poll_data": poll_data
-        }).eq("id", comment_id).execute()
-        
-        if not update_response.data:
-            raise HTTPException(status_code=500, detail="Failed to update poll")
-        
         logger.info(f"✅ User {user_id} voted on comment poll {comment_id}")
         
         return {"poll_data": poll_data}
@@ -1215,56 +1276,35 @@ def create_poll(
     try:
         user_id = str(current_user.id)
         
-        # Verify post exists and user is the author
-        post = supabase.table("posts").select("id, user_id").eq("id", post_id).single().execute()
-        if not post.data:
-            raise HTTPException(status_code=404, detail="Post not found")
-        
-        if post.data["user_id"] != user_id:
-            raise HTTPException(status_code=403, detail="Only the post author can create a poll")
-        
-        # Check if poll already exists
-        existing = supabase.table("polls").select("id").eq("post_id", post_id).execute()
-        if existing.data:
-            raise HTTPException(status_code=400, detail="Poll already exists for this post")
-        
         # Calculate expiration if provided
-        from datetime import datetime, timedelta
         expires_at = None
         if request.expires_in_hours:
-            expires_at = (datetime.utcnow() + timedelta(hours=request.expires_in_hours)).isoformat()
-        
-        # Create poll
-        poll_data = {
-            "post_id": post_id,
-            "question": request.question,
-            "allow_multiple": request.allow_multiple,
-            "color": request.color or "#374151",
-            "expires_at": expires_at
-        }
-        
-        poll_response = supabase.table("polls").insert(poll_data).execute()
-        if not poll_response.data:
-            raise HTTPException(status_code=500, detail="Failed to create poll")
+            expires_at = (datetime.now(timezone.utc) + timedelta(hours=request.expires_in_hours)).isoformat()
         
-        poll = poll_response.data[0]
-        
-        # Create options
-        options_data = [
+        # Poll + options + posts.has_poll en une seule RPC atomique
+        poll_response = supabase.rpc(
+            "create_poll_rpc",
             {
-                "poll_id": poll["id"],
-                "option_text": opt.text,
-                "display_order": idx
+                "p_post_id": post_id,
+                "p_user_id": user_id,
+                "p_question": request.question,
+                "p_options": [opt.text for opt in request.options],
+                "p_allow_multiple": request.allow_multiple,
+                "p_expires_at": expires_at,
+                "p_color": request.color or "#374151"
             }
-            for idx, opt in enumerate(request.options)
-        ]
+        ).execute()
         
-        options_response = supabase.table("poll_options").insert(options_data).execute()
-        if not options_response.data:
-            raise HTTPException(status_code=500, detail="Failed to create poll options")
+        poll = poll_response.data
         
-        # Update post to indicate it has a poll
-        supabase.table("posts").update({"has_poll": True}).eq("id", post_id).execute()
+        if not poll:
+            # Nothing created: resolve the reason only on this error path
+            post = supabase.table("posts").select("id, user_id").eq("id", post_id).execute()
+            if not post.data:
+                raise HTTPException(status_code=404, detail="Post not found")
+            if post.data[0]["user_id"] != user_id:
+                raise HTTPException(status_code=403, detail="Only the post author can create a poll")
+            raise HTTPException(status_code=400, detail="Poll already exists for this post")
         
         logger.info(f"✅ Poll created: {poll['id']} for post {post_id}")
         
@@ -1277,7 +1317,7 @@ def create_poll(
                 percentage=0.0,
                 is_voted=False
             )
-            for opt in options_response.data
+            for opt in poll["options"]
         ]
         
         return PollResponse(
@@ -1318,63 +1358,16 @@ def get_poll(
     try:
         user_id = str(current_user.id)
         
-        # Get poll
-        poll_response = supabase.table("polls").select("*").eq("post_id", post_id).single().execute()
+        # Poll + options (percentage, is_voted) + votes de l'utilisateur en une RPC
+        poll_response = supabase.rpc(
+            "get_poll_full",
+            {"p_post_id": post_id, "p_user_id": user_id}
+        ).execute()
+        
         if not poll_response.data:
             raise HTTPException(status_code=404, detail="Poll not found")
         
-        poll = poll_response.data
-        
-        # Get options
-        options_response = supabase.table("poll_options").select("*").eq(
-            "poll_id", poll["id"]
-        ).order("display_order").execute()
-        
-        options_data = options_response.data or []
-        
-        # Get user's votes
-        option_ids = [opt["id"] for opt in options_data]
-        user_votes = []
-        if option_ids:
-            votes_response = supabase.table("poll_votes").select("poll_option_id").eq(
-                "user_id", user_id
-            ).in_("poll_option_id", option_ids).execute()
-            user_votes = [v["poll_option_id"] for v in (votes_response.data or [])]
-        
-        # Check if expired
-        from datetime import datetime
-        is_expired = False
-        if poll.get("expires_at"):
-            expires_at = datetime.fromisoformat(poll["expires_at"].replace("Z", "+00:00"))
-            is_expired = datetime.now(expires_at.tzinfo) > expires_at
-        
-        # Calculate percentages
-        total = poll.get("total_votes", 0) or 0
-        options = [
-            PollOptionResponse(
-                id=opt["id"],
-                text=opt["option_text"],
-                votes_count=opt.get("votes_count", 0),
-                percentage=round((opt.get("votes_count", 0) / total * 100), 1) if total > 0 else 0.0,
-                is_voted=opt["id"] in user_votes
-            )
-            for opt in options_data
-        ]
-        
-        return PollResponse(
-            id=poll["id"],
-            post_id=post_id,
-            question=poll["question"],
-            options=options,
-            allow_multiple=poll.get("allow_multiple", False),
-            total_votes=total,
-            color=poll.get("color", "#374151"),
-            expires_at=poll.get("expires_at"),
-            is_expired=is_expired,
-            user_voted=len(user_votes) > 0,
-            user_votes=user_votes,
-            created_at=poll["created_at"]
-        )
+        return PollResponse(**poll_response.data)
         
     except HTTPException:
         raise
@@ -1383,6 +1376,23 @@ def get_poll(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Erreurs levées (RAISE EXCEPTION) par les RPC de sondage -> code HTTP
+POLL_RPC_ERRORS = {
+    "Poll not found": 404,
+    "Poll has expired": 400,
+    "Invalid option ID": 400,
+    "This poll only allows one vote": 400,
+}
+
+
+def _raise_poll_rpc_error(error: Exception):
+    """Re-raise a known poll RPC error as the matching HTTPException"""
+    message = getattr(error, "message", None) or str(error)
+    for prefix, status_code in POLL_RPC_ERRORS.items():
+        if prefix in message:
+            raise HTTPException(status_code=status_code, detail=message)
+
+
 # ============================================
 # ENDPOINT: Vote on Poll
 # ============================================
@@ -1400,65 +1410,24 @@ def vote_poll(
     try:
         user_id = str(current_user.id)
         
-        # Get poll
-        poll_response = supabase.table("polls").select("*, post_id").eq("id", poll_id).single().execute()
-        if not poll_response.data:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        
-        poll = poll_response.data
-        
-        # Check if expired
-        from datetime import datetime
-        if poll.get("expires_at"):
-            expires_at = datetime.fromisoformat(poll["expires_at"].replace("Z", "+00:00"))
-            if datetime.now(expires_at.tzinfo) > expires_at:
-                raise HTTPException(status_code=400, detail="Poll has expired")
-        
-        # Get valid option IDs for this poll
-        options_response = supabase.table("poll_options").select("id").eq("poll_id", poll_id).execute()
-        valid_option_ids = {opt["id"] for opt in (options_response.data or [])}
-        
-        # Validate option IDs
-        for opt_id in request.option_ids:
-            if opt_id not in valid_option_ids:
-                raise HTTPException(status_code=400, detail=f"Invalid option ID: {opt_id}")
-        
-        # Check multiple vote restriction
-        if not poll.get("allow_multiple") and len(request.option_ids) > 1:
-            raise HTTPException(status_code=400, detail="This poll only allows one vote")
-        
-        # Get user's existing votes
-        existing_votes = supabase.table("poll_votes").select("id, poll_option_id").eq(
-            "user_id", user_id
-        ).in_("poll_option_id", list(valid_option_ids)).execute()
-        
-        existing_vote_ids = {v["poll_option_id"]: v["id"] for v in (existing_votes.data or [])}
-        
-        # Remove old votes if not allow_multiple
-        if not poll.get("allow_multiple") and existing_vote_ids:
-            for vote_id in existing_vote_ids.values():
-                supabase.table("poll_votes").delete().eq("id", vote_id).execute()
-        
-        # Add new votes
-        new_votes = []
-        for opt_id in request.option_ids:
-            if opt_id not in existing_vote_ids:
-                new_votes.append({
-                    "poll_option_id": opt_id,
-                    "user_id": user_id
-                })
-        
-        if new_votes:
-            supabase.table("poll_votes").insert(new_votes).execute()
+        # Validation + votes + état final du sondage en une seule transaction
+        poll_response = supabase.rpc(
+            "vote_poll",
+            {
+                "p_poll_id": poll_id,
+                "p_user_id": user_id,
+                "p_option_ids": request.option_ids
+            }
+        ).execute()
         
         logger.info(f"✅ User {user_id} voted on poll {poll_id}")
         
-        # Return updated poll
-        return get_poll(poll["post_id"], current_user, supabase)
+        return poll_response.data
         
     except HTTPException:
         raise
     except Exception as e:
+        _raise_poll_rpc_error(e)
         logger.error(f"❌ Error voting on poll: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1479,28 +1448,19 @@ def unvote_poll(
     try:
         user_id = str(current_user.id)
         
-        # Get poll
-        poll_response = supabase.table("polls").select("*, post_id").eq("id", poll_id).single().execute()
-        if not poll_response.data:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        
-        poll = poll_response.data
-        
-        # Get option IDs for this poll
-        options_response = supabase.table("poll_options").select("id").eq("poll_id", poll_id).execute()
-        option_ids = [opt["id"] for opt in (options_response.data or [])]
-        
-        # Delete user's votes
-        if option_ids:
-            supabase.table("poll_votes").delete().eq("user_id", user_id).in_("poll_option_id", option_ids).execute()
+        # Suppression des votes + état final du sondage en une seule transaction
+        poll_response = supabase.rpc(
+            "unvote_poll",
+            {"p_poll_id": poll_id, "p_user_id": user_id}
+        ).execute()
         
         logger.info(f"✅ User {user_id} removed vote from poll {poll_id}")
         
-        # Return updated poll
-        return get_poll(poll["post_id"], current_user, supabase)
+        return poll_response.data
         
     except HTTPException:
         raise
     except Exception as e:
+        _raise_poll_rpc_error(e)
         logger.error(f"❌ Error removing vote: {e}")
         raise HTTPException(status_code=500, detail=str(e))
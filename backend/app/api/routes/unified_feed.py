@@ -2,13 +2,22 @@
 Unified Feed API - Polymorphic Feed (Clusters + Notes)
 Anti-Bruit logic: Only orphan notes + my notes + active clusters
 """
+import asyncio
+import hashlib
 from typing import List, Union, Literal, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import BaseModel, Field
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+import orjson
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response, status
 from loguru import logger
 
-from app.api.dependencies import get_current_user, get_supabase_client, CurrentUser
+from app.api.dependencies import get_current_user, get_supabase_client, get_supabase_rest, CurrentUser
+from app.services.supabase_rest import in_filter
+from app.services.db_pool import PostgresPool
+from app.services.cache import (
+    LocalTTLCache, cache_get_async, cache_set_async,
+    cache_set_tagged_async, invalidate_unified_feed, unified_feed_cache_key, unified_feed_cache_tag
+)
 
 
 router = APIRouter(prefix="/feed/unified", tags=["Unified Feed"])
@@ -17,6 +26,8 @@ router = APIRouter(prefix="/feed/unified", tags=["Unified Feed"])
 # ============================================
 # MODELS - Polymorphic Feed Items
 # ============================================
+# Les dates restent des chaînes ISO telles que renvoyées par Postgres:
+# aucun calcul côté serveur, inutile de parser puis re-sérialiser
 
 class ClusterFeedItem(BaseModel):
     """Cluster dans le feed unifié"""
@@ -31,10 +42,10 @@ class ClusterFeedItem(BaseModel):
     likes_count: int = 0
     comments_count: int = 0
     is_liked: bool = False
-    created_at: datetime
-    last_updated_at: datetime
+    created_at: str
+    last_updated_at: str
     preview_notes: Optional[List[dict]] = Field(default_factory=list)
-    sort_date: datetime
+    sort_date: str
 
 
 class NoteFeedItem(BaseModel):
@@ -56,9 +67,9 @@ class NoteFeedItem(BaseModel):
     likes_count: int = 0
     comments_count: int = 0
     is_liked: bool = False
-    created_at: datetime
-    processed_at: Optional[datetime] = None
-    sort_date: datetime
+    created_at: str
+    processed_at: Optional[str] = None
+    sort_date: str
 
 
 class PostFeedItem(BaseModel):
@@ -80,14 +91,22 @@ class PostFeedItem(BaseModel):
     is_liked: bool = False
     is_saved: bool = False
     is_mine: bool
-    created_at: datetime
-    sort_date: datetime
+    created_at: str
+    sort_date: str
 
 
 # Union discriminée pour le polymorphisme
 FeedItem = Union[ClusterFeedItem, NoteFeedItem, PostFeedItem]
 
 
+# Lignes RPC déjà typées par Postgres: model_construct (défauts, sans validation)
+FEED_ITEM_MODELS = {
+    "CLUSTER": ClusterFeedItem,
+    "NOTE": NoteFeedItem,
+    "POST": PostFeedItem,
+}
+
+
 class UnifiedFeedResponse(BaseModel):
     """Réponse du feed unifié"""
     items: List[FeedItem]
@@ -99,12 +118,131 @@ class UnifiedFeedResponse(BaseModel):
 # ENDPOINT: Get Unified Feed
 # ============================================
 
+# Valeurs utilisées quand la colonne RPC est NULL (champs requis par les modèles)
+_FEED_ROW_DEFAULTS = {
+    "CLUSTER": {"title": "Untitled Cluster", "note_count": 0, "velocity_score": 0.0},
+    "NOTE": {"content": "", "status": "processed", "user_id": "", "is_mine": False},
+    "POST": {
+        "content": "", "post_type": "standard", "user_id": "",
+        "likes_count": 0, "comments_count": 0, "is_mine": False
+    },
+}
+
+
+def _normalize_feed_row(row: dict) -> dict:
+    """
+    Prépare une ligne de get_unified_feed_optimized pour FEED_ITEM_MODELS
+    (colonnes NULL -> défauts du modèle, item_type -> type)
+    Le titre des notes (title_clarified ou contenu tronqué) est calculé en SQL
+    """
+    item_type = row['item_type']
+    data = {**_FEED_ROW_DEFAULTS[item_type], **{k: v for k, v in row.items() if v is not None}}
+    data['type'] = item_type
+    
+    if item_type == 'CLUSTER':
+        data.setdefault('last_updated_at', row['created_at'])
+    
+    return data
+
+
+FEED_STATS_COLUMNS = "orphan_notes_count,clustered_notes_count,active_clusters_count,last_note_at"
+
+# Agrégats par organisation: quelques secondes de retard sont acceptables
+# 1er niveau en mémoire du process, 2e niveau Redis partagé entre workers
+FEED_STATS_CACHE_TTL = 10  # secondes
+FEED_STATS_REDIS_TTL = 30  # secondes
+_feed_stats_cache = LocalTTLCache(maxsize=4096, ttl_seconds=FEED_STATS_CACHE_TTL)
+
+
+def _feed_stats_key(organization_id: str) -> str:
+    return f"org:{organization_id}:feed_stats"
+
+
+async def _fetch_feed_stats(rest, organization_id: str) -> tuple[dict, str]:
+    """Stats du feed (v_feed_stats) + statut de cache ("HIT" / "MISS")"""
+    cached = _feed_stats_cache.get(organization_id)
+    if cached is not None:
+        return cached, "HIT"
+    
+    cached = await cache_get_async(_feed_stats_key(organization_id))
+    if cached is not None:
+        _feed_stats_cache.set(organization_id, cached)
+        return cached, "HIT"
+    
+    stats_data = await rest.select("v_feed_stats", {
+        "select": FEED_STATS_COLUMNS,
+        "organization_id": f"eq.{organization_id}"
+    })
+    stats = stats_data[0] if stats_data else {}
+    _feed_stats_cache.set(organization_id, stats)
+    await cache_set_async(_feed_stats_key(organization_id), stats, FEED_STATS_REDIS_TTL)
+    return stats, "MISS"
+
+
+async def _fetch_optional_feed_stats(rest, organization_id: str) -> dict:
+    """Stats jointes au feed (include_stats), non bloquant: {} en cas d'erreur"""
+    try:
+        stats, _ = await _fetch_feed_stats(rest, organization_id)
+        return stats
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to fetch feed stats: {e}")
+        return {}
+
+
+# Page complète agrégée en un seul jsonb côté Postgres: même forme que la
+# réponse PostgREST (dates ISO, jsonb imbriqués), un seul orjson.loads
+UNIFIED_FEED_SQL = """
+    SELECT COALESCE(jsonb_agg(f), '[]'::jsonb)::text
+    FROM get_unified_feed_optimized($1::uuid, $2::uuid, $3, $4) f
+"""
+
+
+async def _fetch_unified_feed_rows(rest, organization_id: str, user_id: str, limit: int, offset: int) -> list:
+    """
+    Lignes de get_unified_feed_optimized: asyncpg direct si DATABASE_URL est
+    configuré (pas de passage par PostgREST), sinon RPC REST
+    """
+    pool = PostgresPool.get_pool()
+    if pool is not None:
+        rows_json = await pool.fetchval(UNIFIED_FEED_SQL, organization_id, user_id, limit, offset)
+        return orjson.loads(rows_json)
+    
+    return await rest.rpc(
+        'get_unified_feed_optimized',
+        {
+            'p_organization_id': organization_id,
+            'p_user_id': user_id,
+            'p_limit': limit,
+            'p_offset': offset
+        }
+    )
+
+
+# Feed par utilisateur (is_liked / is_mine): TTL court, invalidé par org sur écriture
+UNIFIED_FEED_CACHE_TTL = 15  # secondes
+
+
+def _feed_response(request: Request, payload: dict, cache_status: str) -> Response:
+    """
+    Sérialise la page une fois et l'étiquette (ETag = hash du corps)
+    If-None-Match identique -> 304 sans corps: le client garde sa copie
+    """
+    body = orjson.dumps(payload)
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "X-Cache": cache_status}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/", response_model=UnifiedFeedResponse)
-def get_unified_feed(
+async def get_unified_feed(
+    request: Request,
     limit: int = Query(default=50, ge=1, le=100, description="Number of items to return"),
     offset: int = Query(default=0, ge=0, description="Pagination offset"),
+    include_stats: bool = Query(default=False, description="Include v_feed_stats (first load only)"),
     current_user: CurrentUser = Depends(get_current_user),
-    supabase = Depends(get_supabase_client)
+    rest = Depends(get_supabase_rest)
 ):
     """
     Unified polymorphic feed combining Clusters, Notes and Posts.
@@ -119,98 +257,34 @@ def get_unified_feed(
     organization_id = str(current_user.organization_id)
     user_id = str(current_user.id)
     
+    # Page déjà calculée pour cet utilisateur il y a moins de UNIFIED_FEED_CACHE_TTL s
+    cache_key = unified_feed_cache_key(organization_id, user_id, limit, offset, include_stats)
+    cached = await cache_get_async(cache_key)
+    if cached is not None:
+        return _feed_response(request, cached, "HIT")
+    
     items = []
     
+    # Stats indépendantes du feed: la requête part pendant le RPC
+    # Seulement si demandées (premier chargement): le scroll paginé s'en passe
+    stats_task = None
+    if include_stats:
+        stats_task = asyncio.create_task(_fetch_optional_feed_stats(rest, organization_id))
+    
     # ============================================
     # EXECUTE OPTIMIZED RPC
     # ============================================
     try:
-        response = supabase.rpc(
-            'get_unified_feed_optimized',
-            {
-                'p_organization_id': organization_id,
-                'p_user_id': user_id,
-                'p_limit': limit,
-                'p_offset': offset
-            }
-        ).execute()
+        rows = await _fetch_unified_feed_rows(rest, organization_id, user_id, limit, offset)
         
-        if response.data:
+        if rows:
             # ============================================
-            # MAP RPC RESULT TO PYDANTIC MODELS
+            # MAP RPC RESULT TO PYDANTIC MODELS (sans re-validation)
             # ============================================
-            for row in response.data:
-                item_type = row.get('item_type')
-                
-                if item_type == 'CLUSTER':
-                    items.append(ClusterFeedItem(
-                        type="CLUSTER",
-                        id=row['id'],
-                        title=row.get('title') or 'Untitled Cluster',
-                        note_count=row.get('note_count') or 0,
-                        velocity_score=row.get('velocity_score') or 0.0,
-                        pillar_id=row.get('pillar_id'),
-                        pillar_name=row.get('pillar_name'),
-                        pillar_color=row.get('pillar_color'),
-                        likes_count=row.get('likes_count') or 0,
-                        comments_count=row.get('comments_count') or 0,
-                        is_liked=row.get('is_liked') or False,
-                        created_at=row['created_at'],
-                        last_updated_at=row.get('last_updated_at') or row['created_at'],
-                        preview_notes=row.get('preview_notes') or [],
-                        sort_date=row['sort_date']
-                    ))
-                    
-                elif item_type == 'NOTE':
-                    title = row.get('title_clarified')
-                    if not title:
-                        content = row.get('content') or row.get('content_clarified') or row.get('content_raw') or ""
-                        title = content[:80] + "..." if len(content) > 80 else content
-                    
-                    items.append(NoteFeedItem(
-                        type="NOTE",
-                        id=row['id'],
-                        title=title,
-                        content=row.get('content') or "",
-                        content_raw=row.get('content_raw'),
-                        content_clarified=row.get('content_clarified'),
-                        status=row.get('status') or 'processed',
-                        cluster_id=row.get('cluster_id'),
-                        pillar_id=row.get('pillar_id'),
-                        pillar_name=row.get('pillar_name'),
-                        pillar_color=row.get('pillar_color'),
-                        ai_relevance_score=row.get('ai_relevance_score'),
-                        user_id=row.get('user_id') or "",
-                        is_mine=row.get('is_mine') or False,
-                        likes_count=row.get('likes_count') or 0,
-                        comments_count=row.get('comments_count') or 0,
-                        is_liked=row.get('is_liked') or False,
-                        created_at=row['created_at'],
-                        processed_at=row.get('processed_at'),
-                        sort_date=row['sort_date']
-                    ))
-                    
-                elif item_type == 'POST':
-                    items.append(PostFeedItem(
-                        type="POST",
-                        id=row['id'],
-                        content=row.get('content') or "",
-                        post_type=row.get('post_type') or 'standard',
-                        media_urls=row.get('media_urls'),
-                        has_poll=row.get('has_poll') or False,
-                        user_id=row.get('user_id') or "",
-                        user_info=row.get('user_info'),
-                        likes_count=row.get('likes_count') or 0,
-                        comments_count=row.get('comments_count') or 0,
-                        saves_count=row.get('saves_count') or 0,
-                        shares_count=row.get('shares_count') or 0,
-                        virality_score=row.get('virality_score') or 0.0,
-                        is_liked=row.get('is_liked') or False,
-                        is_saved=row.get('is_saved') or False,
-                        is_mine=row.get('is_mine') or False,
-                        created_at=row['created_at'],
-                        sort_date=row['sort_date']
-                    ))
+            items = [
+                FEED_ITEM_MODELS[row['item_type']].model_construct(**_normalize_feed_row(row))
+                for row in rows if row.get('item_type') in FEED_ITEM_MODELS
+            ]
             
             logger.info(f"📊 Feed (optimized RPC): {len(items)} items returned")
             
@@ -226,45 +300,49 @@ def get_unified_feed(
             if post_ids_with_polls:
                 try:
                     # Fetch all polls in ONE query instead of N queries
-                    polls_response = supabase.table("polls").select(
-                        "id, post_id, question, allow_multiple, expires_at, color, created_at"
-                    ).in_("post_id", post_ids_with_polls).execute()
+                    polls_data = await rest.select("polls", {
+                        "select": "id,post_id,question,allow_multiple,expires_at,color,created_at",
+                        "post_id": in_filter(post_ids_with_polls)
+                    })
                     
-                    if polls_response.data:
+                    if polls_data:
                         # Get all poll IDs
-                        poll_ids = [p['id'] for p in polls_response.data]
+                        poll_ids = [p['id'] for p in polls_data]
                         
                         # Fetch all options for all polls in ONE query
-                        options_response = supabase.table("poll_options").select(
-                            "id, poll_id, option_text"
-                        ).in_("poll_id", poll_ids).execute()
+                        options_data = await rest.select("poll_options", {
+                            "select": "id,poll_id,option_text",
+                            "poll_id": in_filter(poll_ids)
+                        }) or []
+                        option_ids = [o['id'] for o in options_data]
                         
-                        # Fetch vote counts for all options in ONE query
-                        votes_response = supabase.table("poll_votes").select(
-                            "poll_option_id"
-                        ).in_("poll_option_id", [o['id'] for o in (options_response.data or [])]).execute()
-                        
-                        # Fetch user's votes
-                        user_votes_response = supabase.table("poll_votes").select(
-                            "poll_option_id"
-                        ).eq("user_id", user_id).in_(
-                            "poll_option_id", [o['id'] for o in (options_response.data or [])]
-                        ).execute()
+                        # Vote counts + user's votes: indépendants, lancés en parallèle
+                        votes_data, user_votes_data = await asyncio.gather(
+                            rest.select("poll_votes", {
+                                "select": "poll_option_id",
+                                "poll_option_id": in_filter(option_ids)
+                            }),
+                            rest.select("poll_votes", {
+                                "select": "poll_option_id",
+                                "user_id": f"eq.{user_id}",
+                                "poll_option_id": in_filter(option_ids)
+                            })
+                        )
                         
                         # Build vote count map
                         vote_counts = {}
-                        for vote in (votes_response.data or []):
+                        for vote in (votes_data or []):
                             opt_id = vote['poll_option_id']
                             vote_counts[opt_id] = vote_counts.get(opt_id, 0) + 1
                         
                         # Build user votes set
                         user_voted_options = set(
-                            v['poll_option_id'] for v in (user_votes_response.data or [])
+                            v['poll_option_id'] for v in (user_votes_data or [])
                         )
                         
                         # Build options map by poll_id
                         options_by_poll = {}
-                        for opt in (options_response.data or []):
+                        for opt in options_data:
                             poll_id = opt['poll_id']
                             if poll_id not in options_by_poll:
                                 options_by_poll[poll_id] = []
@@ -277,7 +355,9 @@ def get_unified_feed(
                         
                         # Build polls map by post_id
                         polls_by_post = {}
-                        for poll in polls_response.data:
+                        # Une seule horloge tz-aware pour tous les sondages de la page
+                        now = datetime.now(timezone.utc)
+                        for poll in polls_data:
                             post_id = poll['post_id']
                             poll_id = poll['id']
                             options = options_by_poll.get(poll_id, [])
@@ -287,10 +367,10 @@ def get_unified_feed(
                             # Check expiration
                             is_expired = False
                             if poll.get('expires_at'):
-                                from datetime import datetime as dt
                                 try:
-                                    expires = dt.fromisoformat(poll['expires_at'].replace('Z', '+00:00'))
-                                    is_expired = dt.now(expires.tzinfo) > expires
+                                    # Python 3.11+: fromisoformat accepte le suffixe "Z"
+                                    expires = datetime.fromisoformat(poll['expires_at'])
+                                    is_expired = now > expires
                                 except:
                                     pass
                             
@@ -326,31 +406,35 @@ def get_unified_feed(
 
     except Exception as e:
         logger.error(f"❌ RPC Failed provided by optimized feed with error: {e}")
+        if stats_task is not None:
+            stats_task.cancel()
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching feed: {str(e)}"
         )
     
     # ============================================
-    # GET FEED STATS (Optional)
+    # GET FEED STATS (Optional, lancé en parallèle du RPC)
     # ============================================
     stats = {}
-    try:
-        stats_response = supabase.table("v_feed_stats").select("*").eq(
-            "organization_id", organization_id
-        ).execute()
-        
-        if stats_response.data and len(stats_response.data) > 0:
-            stats = stats_response.data[0]
-    except Exception as e:
-        logger.warning(f"⚠️ Failed to fetch feed stats: {e}")
-        stats = {}
+    if stats_task is not None:
+        if items:
+            stats = await stats_task
+        else:
+            # Feed vide: inutile d'attendre les stats
+            stats_task.cancel()
     
-    return UnifiedFeedResponse(
-        items=items,
-        total_count=len(items),
-        stats=stats
+    payload = {
+        "items": [item.model_dump() for item in items],
+        "total_count": len(items),
+        "stats": stats
+    }
+    await cache_set_tagged_async(
+        cache_key, payload, UNIFIED_FEED_CACHE_TTL, unified_feed_cache_tag(organization_id)
     )
+    
+    # Response directe: FastAPI ne re-valide pas contre response_model (gardé pour l'OpenAPI)
+    return _feed_response(request, payload, "MISS")
 
 
 
@@ -359,9 +443,10 @@ def get_unified_feed(
 # ============================================
 
 @router.get("/stats")
-def get_feed_stats(
+async def get_feed_stats(
+    response: Response,
     current_user: dict = Depends(get_current_user),
-    supabase = Depends(get_supabase_client)
+    rest = Depends(get_supabase_rest)
 ):
     """
     Statistiques du feed unifié
@@ -375,11 +460,11 @@ def get_feed_stats(
     try:
         organization_id = str(current_user.organization_id)
         
-        stats_response = supabase.table("v_feed_stats").select("*").eq(
-            "organization_id", organization_id
-        ).execute()
+        # Mêmes niveaux de cache que /feed/unified (process -> Redis -> v_feed_stats)
+        stats, cache_status = await _fetch_feed_stats(rest, organization_id)
+        response.headers["X-Cache"] = cache_status
         
-        if not stats_response.data or len(stats_response.data) == 0:
+        if not stats:
             return {
                 "orphan_notes_count": 0,
                 "clustered_notes_count": 0,
@@ -387,143 +472,121 @@ def get_feed_stats(
                 "last_note_at": None
             }
         
-        return stats_response.data[0]
+        return stats
         
     except Exception as e:
         logger.error(f"❌ Error fetching feed stats: {e}")
-        raise
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 # ============================================
-# ENDPOINT: Get Item Details (Polymorphic)
+# ENDPOINT: Get Item Details (Cluster / Note)
 # ============================================
 
-@router.get("/{item_type}/{item_id}")
-def get_feed_item_details(
-    item_type: Literal["cluster", "note"],
-    item_id: str,
-    current_user: dict = Depends(get_current_user),
-    supabase = Depends(get_supabase_client)
-):
-    """
-    Récupère les détails complets d'un item du feed
+class ClusterDetails(BaseModel):
+    """Détail d'un cluster (forme de get_feed_item 'cluster')"""
+    id: str
+    title: Optional[str] = None
+    note_count: int = 0
+    pillar_id: Optional[str] = None
+    pillar_name: Optional[str] = None
+    pillar_color: Optional[str] = None
+    likes_count: int = 0
+    comments_count: int = 0
+    is_liked: bool = False
+    preview_notes: List[dict] = Field(default_factory=list)
+    created_at: Optional[str] = None
+    last_updated_at: Optional[str] = None
+
+
+class NoteDetails(BaseModel):
+    """Détail d'une note (forme de get_feed_item 'note')"""
+    id: str
+    title: Optional[str] = None
+    content: Optional[str] = None
+    content_raw: Optional[str] = None
+    content_clarified: Optional[str] = None
+    status: Optional[str] = None
+    pillar_id: Optional[str] = None
+    pillar_name: Optional[str] = None
+    pillar_color: Optional[str] = None
+    cluster_id: Optional[str] = None
+    ai_relevance_score: Optional[float] = None
+    user_id: Optional[str] = None
+    user_info: Optional[dict] = None
+    likes_count: int = 0
+    comments_count: int = 0
+    is_liked: bool = False
+    created_at: Optional[str] = None
+    processed_at: Optional[str] = None
+
+
+async def _fetch_feed_item(rest, item_type: str, item_id: str, organization_id: str, user_id: str) -> Optional[dict]:
+    """get_feed_item via asyncpg si DATABASE_URL est configuré, sinon RPC REST"""
+    pool = PostgresPool.get_pool()
+    if pool is not None:
+        item_json = await pool.fetchval(
+            "SELECT get_feed_item($1, $2::uuid, $3::uuid, $4::uuid)::text",
+            item_type, item_id, organization_id, user_id
+        )
+        return orjson.loads(item_json) if item_json else None
     
-    **item_type** : "cluster" ou "note"
-    **item_id** : UUID de l'item
-    """
+    return await rest.rpc("get_feed_item", {
+        "p_type": item_type,
+        "p_id": item_id,
+        "p_organization_id": organization_id,
+        "p_user_id": user_id
+    })
+
+
+async def _get_feed_item_details(rest, item_type: str, item_id: str, current_user) -> dict:
+    """Item + pilier + like + aperçu/auteur assemblés côté SQL (get_feed_item), 404 si absent"""
     try:
         organization_id = str(current_user.organization_id)
         user_id = str(current_user.id)
         
-        if item_type == "cluster":
-            # Fetch cluster with all notes
-            cluster_response = supabase.table("clusters").select(
-                "*, pillars(name, color)"
-            ).eq("id", item_id).eq("organization_id", organization_id).single().execute()
-            
-            if not cluster_response.data:
-                raise HTTPException(status_code=404, detail="Cluster not found")
-            
-            cluster = cluster_response.data
-            
-            # Check if user liked this cluster
-            is_liked = False
-            try:
-                like_check = supabase.table("cluster_likes").select("id").eq(
-                    "cluster_id", item_id
-                ).eq("user_id", user_id).execute()
-                is_liked = bool(like_check.data and len(like_check.data) > 0)
-            except:
-                pass
-            
-            # Get preview notes
-            preview_notes = []
-            try:
-                notes_resp = supabase.table("notes").select(
-                    "id, content_clarified, content_raw"
-                ).eq("cluster_id", item_id).limit(5).execute()
-                for n in (notes_resp.data or []):
-                    preview_notes.append({
-                        "id": n["id"],
-                        "content": n.get("content_clarified") or n.get("content_raw")
-                    })
-            except:
-                pass
-            
-            return {
-                "id": cluster["id"],
-                "title": cluster["title"],
-                "note_count": cluster.get("note_count", 0),
-                "pillar_id": cluster.get("pillar_id"),
-                "pillar_name": cluster.get("pillars", {}).get("name") if cluster.get("pillars") else None,
-                "pillar_color": cluster.get("pillars", {}).get("color") if cluster.get("pillars") else None,
-                "likes_count": cluster.get("likes_count", 0),
-                "comments_count": cluster.get("comments_count", 0),
-                "is_liked": is_liked,
-                "preview_notes": preview_notes,
-                "created_at": cluster["created_at"],
-                "last_updated_at": cluster["last_updated_at"],
-            }
-            
-        elif item_type == "note":
-            # Fetch note with details
-            note_response = supabase.table("notes").select(
-                "*, users(email, first_name, last_name, avatar_url), pillars(name, color), clusters(title)"
-            ).eq("id", item_id).eq("organization_id", organization_id).single().execute()
-            
-            if not note_response.data:
-                raise HTTPException(status_code=404, detail="Note not found")
-            
-            note = note_response.data
-            
-            # Check if user liked this note
-            is_liked = False
-            try:
-                like_check = supabase.table("note_likes").select("id").eq(
-                    "note_id", item_id
-                ).eq("user_id", user_id).execute()
-                is_liked = bool(like_check.data and len(like_check.data) > 0)
-            except:
-                pass
-            
-            user_info = note.get("users") or {}
-            
-            return {
-                "id": note["id"],
-                "title": note.get("title_clarified"),
-                "content": note.get("content_clarified") or note.get("content_raw"),
-                "content_raw": note.get("content_raw"),
-                "content_clarified": note.get("content_clarified"),
-                "status": note["status"],
-                "pillar_id": note.get("pillar_id"),
-                "pillar_name": note.get("pillars", {}).get("name") if note.get("pillars") else None,
-                "pillar_color": note.get("pillars", {}).get("color") if note.get("pillars") else None,
-                "cluster_id": note.get("cluster_id"),
-                "ai_relevance_score": note.get("ai_relevance_score"),
-                "user_id": note["user_id"],
-                "user_info": {
-                    "email": user_info.get("email"),
-                    "first_name": user_info.get("first_name"),
-                    "last_name": user_info.get("last_name"),
-                    "avatar_url": user_info.get("avatar_url"),
-                },
-                "likes_count": note.get("likes_count", 0),
-                "comments_count": note.get("comments_count", 0),
-                "is_liked": is_liked,
-                "created_at": note["created_at"],
-                "processed_at": note.get("processed_at"),
-            }
+        item = await _fetch_feed_item(rest, item_type, item_id, organization_id, user_id)
         
-        else:
-            raise HTTPException(status_code=400, detail="Invalid item type")
+        if not item:
+            raise HTTPException(status_code=404, detail=f"{item_type.capitalize()} not found")
+        
+        return item
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Error fetching item details: {e}")
+        logger.error(f"❌ Error fetching {item_type} details: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cluster/{item_id}", response_model=ClusterDetails)
+async def get_cluster_details(
+    item_id: str,
+    current_user: dict = Depends(get_current_user),
+    rest = Depends(get_supabase_rest)
+):
+    """
+    Récupère les détails complets d'un cluster du feed
+    
+    **item_id** : UUID du cluster
+    """
+    return await _get_feed_item_details(rest, "cluster", item_id, current_user)
+
+
+@router.get("/note/{item_id}", response_model=NoteDetails)
+async def get_note_details(
+    item_id: str,
+    current_user: dict = Depends(get_current_user),
+    rest = Depends(get_supabase_rest)
+):
+    """
+    Récupère les détails complets d'une note du feed
+    
+    **item_id** : UUID de la note
+    """
+    return await _get_feed_item_details(rest, "note", item_id, current_user)
+
+
 # ============================================
 # ENDPOINT: Like/Unlike Note
 # ============================================
@@ -547,40 +610,21 @@ def toggle_like_note(
         user_id = str(current_user.id)
         organization_id = str(current_user.organization_id)
         
-        # Vérifier que la note existe et appartient à l'org
-        note = supabase.table("notes").select("id, likes_count").eq(
-            "id", note_id
-        ).eq("organization_id", organization_id).execute()
+        # Vérification org + toggle + nouveau compteur en une seule transaction
+        result = supabase.rpc("toggle_note_like", {
+            "p_note_id": note_id,
+            "p_user_id": user_id,
+            "p_organization_id": organization_id
+        }).execute()
         
-        if not note.data or len(note.data) == 0:
+        if not result.data:
             raise HTTPException(status_code=404, detail="Note not found")
         
-        # Check if already liked
-        existing = supabase.table("note_likes").select("id").eq(
-            "note_id", note_id
-        ).eq("user_id", user_id).execute()
-        
-        if existing.data and len(existing.data) > 0:
-            # Unlike
-            supabase.table("note_likes").delete().eq(
-                "note_id", note_id
-            ).eq("user_id", user_id).execute()
-            action = "unliked"
-        else:
-            # Like
-            supabase.table("note_likes").insert({
-                "note_id": note_id,
-                "user_id": user_id
-            }).execute()
-            action = "liked"
-        
-        # Get updated count (trigger should have updated it)
-        updated_note = supabase.table("notes").select("likes_count").eq("id", note_id).single().execute()
-        new_count = updated_note.data.get("likes_count", 0) if updated_note.data else 0
-        
+        action = result.data["action"]
+        invalidate_unified_feed(organization_id)
         logger.info(f"✅ Note {action}: {note_id} by user {user_id}")
         
-        return EngagementResponse(success=True, action=action, new_count=new_count)
+        return EngagementResponse(success=True, action=action, new_count=result.data["new_count"])
         
     except HTTPException:
         raise
@@ -606,40 +650,21 @@ def toggle_like_cluster(
         user_id = str(current_user.id)
         organization_id = str(current_user.organization_id)
         
-        # Vérifier que le cluster existe et appartient à l'org
-        cluster = supabase.table("clusters").select("id, likes_count").eq(
-            "id", cluster_id
-        ).eq("organization_id", organization_id).execute()
+        # Vérification org + toggle + nouveau compteur en une seule transaction
+        result = supabase.rpc("toggle_cluster_like", {
+            "p_cluster_id": cluster_id,
+            "p_user_id": user_id,
+            "p_organization_id": organization_id
+        }).execute()
         
-        if not cluster.data or len(cluster.data) == 0:
+        if not result.data:
             raise HTTPException(status_code=404, detail="Cluster not found")
         
-        # Check if already liked
-        existing = supabase.table("cluster_likes").select("id").eq(
-            "cluster_id", cluster_id
-        ).eq("user_id", user_id).execute()
-        
-        if existing.data and len(existing.data) > 0:
-            # Unlike
-            supabase.table("cluster_likes").delete().eq(
-                "cluster_id", cluster_id
-            ).eq("user_id", user_id).execute()
-            action = "unliked"
-        else:
-            # Like
-            supabase.table("cluster_likes").insert({
-                "cluster_id": cluster_id,
-                "user_id": user_id
-            }).execute()
-            action = "liked"
-        
-        # Get updated count
-        updated_cluster = supabase.table("clusters").select("likes_count").eq("id", cluster_id).single().execute()
-        new_count = updated_cluster.data.get("likes_count", 0) if updated_cluster.data else 0
-        
+        action = result.data["action"]
+        invalidate_unified_feed(organization_id)
         logger.info(f"✅ Cluster {action}: {cluster_id} by user {user_id}")
         
-        return EngagementResponse(success=True, action=action, new_count=new_count)
+        return EngagementResponse(success=True, action=action, new_count=result.data["new_count"])
         
     except HTTPException:
         raise
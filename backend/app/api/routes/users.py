@@ -9,6 +9,7 @@ from loguru import logger
 import os
 
 from app.services.supabase_client import supabase
+from app.services.cache import cache_get_async, cache_set_async, cache_delete_async
 from app.api.dependencies import get_current_user, CurrentUser
 
 router = APIRouter()
@@ -16,6 +17,48 @@ router = APIRouter()
 # Allowed image MIME types
 ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = 64 * 1024  # 64KB
+
+
+def _sniff_image_type(head: bytes) -> Optional[str]:
+    """MIME type from the file signature (magic number), None if not an allowed image"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+# Profils publics (GET /{user_id}, /email/{email}): rarement modifiés
+USER_CACHE_TTL = 300  # secondes
+
+
+def _user_id_key(user_id: str) -> str:
+    return f"user:id:{user_id}"
+
+
+def _normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def _user_email_key(email: str) -> str:
+    # Normalisé: une variante de casse/espaces ne garde pas un profil périmé après invalidation
+    return f"user:email:{_normalize_email(email)}"
+
+
+def _email_exact_ilike(email: str) -> str:
+    """Motif ilike = égalité insensible à la casse (%, _ et \\ échappés)"""
+    normalized = _normalize_email(email)
+    return normalized.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def _invalidate_user_cache(current_user: CurrentUser) -> None:
+    """Drop cached lookups of the user after a profile/avatar write"""
+    await cache_delete_async(_user_id_key(str(current_user.id)), _user_email_key(current_user.email))
 
 
 # ============================================
@@ -106,6 +149,7 @@ async def update_current_user_profile(
         if not response.data:
             raise HTTPException(status_code=404, detail="User not found or update failed")
         
+        await _invalidate_user_cache(current_user)
         logger.info(f"User {current_user.id} profile updated successfully")
         return response.data[0]
         
@@ -137,15 +181,31 @@ async def upload_avatar(
                 detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_IMAGE_TYPES)}"
             )
         
-        # 2. Read file content
-        file_content = await file.read()
+        # 2-3. Read file content by chunks, validating size as we go:
+        # un fichier trop gros est rejeté dès MAX_FILE_SIZE dépassé, sans être chargé en entier
+        too_large = HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size: {MAX_FILE_SIZE / (1024*1024)}MB"
+        )
+        if file.size is not None and file.size > MAX_FILE_SIZE:
+            raise too_large
         
-        # 3. Validate file size
-        if len(file_content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Maximum size: {MAX_FILE_SIZE / (1024*1024)}MB"
-            )
+        chunks = []
+        total_size = 0
+        sniffed_type = None
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            if not chunks:
+                # Signature du premier bloc: le content_type du client n'est pas une preuve
+                sniffed_type = _sniff_image_type(chunk)
+                if sniffed_type not in ALLOWED_IMAGE_TYPES:
+                    raise HTTPException(status_code=400, detail="File content is not a supported image")
+            total_size += len(chunk)
+            if total_size > MAX_FILE_SIZE:
+                raise too_large
+            chunks.append(chunk)
+        if sniffed_type is None:
+            raise HTTPException(status_code=400, detail="Empty file")
+        file_content = b"".join(chunks)
         
         # 4. Generate unique filename: {user_id}/{uuid}.{ext}
         file_ext = file.filename.split(".")[-1] if file.filename else "jpg"
@@ -158,7 +218,7 @@ async def upload_avatar(
             upload_response = supabase.storage.from_("avatars").upload(
                 path=unique_filename,
                 file=file_content,
-                file_options={"content-type": file.content_type, "upsert": "true"}
+                file_options={"content-type": sniffed_type, "upsert": "true"}
             )
             logger.info(f"Upload response: {upload_response}")
         except Exception as storage_error:
@@ -171,14 +231,16 @@ async def upload_avatar(
         
         logger.info(f"Avatar uploaded successfully. URL: {avatar_url}")
         
-        # 7. Update user's avatar_url in database
+        # 7. Update user's avatar_url (+ storage path, used by delete) in database
         update_response = supabase.table("users").update({
-            "avatar_url": avatar_url
+            "avatar_url": avatar_url,
+            "avatar_path": unique_filename
         }).eq("id", str(current_user.id)).execute()
         
         if not update_response.data:
             raise HTTPException(status_code=500, detail="Failed to update user avatar URL")
         
+        await _invalidate_user_cache(current_user)
         logger.info(f"User {current_user.id} avatar_url updated successfully")
         
         return AvatarUploadResponse(
@@ -201,23 +263,23 @@ async def delete_avatar(
     Delete the current user's avatar
     """
     try:
-        # Get current avatar URL
-        user_response = supabase.table("users").select("avatar_url").eq("id", str(current_user.id)).single().execute()
-        
-        if user_response.data and user_response.data.get("avatar_url"):
-            # Extract file path from URL
-            avatar_url = user_response.data["avatar_url"]
-            # The path is typically after /avatars/
-            if "/avatars/" in avatar_url:
-                file_path = avatar_url.split("/avatars/")[-1]
-                try:
-                    supabase.storage.from_("avatars").remove([file_path])
-                    logger.info(f"Deleted avatar file: {file_path}")
-                except Exception as e:
-                    logger.warning(f"Could not delete avatar file: {e}")
-        
-        # Clear avatar_url in database
-        supabase.table("users").update({"avatar_url": None}).eq("id", str(current_user.id)).execute()
+        # Get current avatar storage path (stored at upload, see add_user_avatar_path.sql)
+        user_response = supabase.table("users").select("avatar_path").eq("id", str(current_user.id)).single().execute()
+        
+        file_path = user_response.data.get("avatar_path") if user_response.data else None
+        if file_path:
+            try:
+                supabase.storage.from_("avatars").remove([file_path])
+                logger.info(f"Deleted avatar file: {file_path}")
+            except Exception as e:
+                logger.warning(f"Could not delete avatar file: {e}")
+        
+        # Clear avatar_url / avatar_path in database
+        supabase.table("users").update({
+            "avatar_url": None,
+            "avatar_path": None
+        }).eq("id", str(current_user.id)).execute()
+        await _invalidate_user_cache(current_user)
         
         return {"message": "Avatar deleted successfully"}
         
@@ -232,11 +294,17 @@ async def get_user(user_id: UUID):
     Get user profile by ID
     """
     try:
+        cache_key = _user_id_key(str(user_id))
+        cached = await cache_get_async(cache_key)
+        if cached is not None:
+            return cached
+        
         response = supabase.table("users").select("*").eq("id", str(user_id)).single().execute()
         
         if not response.data:
             raise HTTPException(status_code=404, detail="User not found")
         
+        await cache_set_async(cache_key, response.data, USER_CACHE_TTL)
         return response.data
         
     except Exception as e:
@@ -250,11 +318,18 @@ async def get_user_by_email(email: str):
     Get user by email (for login/lookup)
     """
     try:
-        response = supabase.table("users").select("*").eq("email", email).single().execute()
+        cache_key = _user_email_key(email)
+        cached = await cache_get_async(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Même normalisation que la clé de cache: toutes les variantes partagent la réponse
+        response = supabase.table("users").select("*").ilike("email", _email_exact_ilike(email)).single().execute()
         
         if not response.data:
             raise HTTPException(status_code=404, detail="User not found")
         
+        await cache_set_async(cache_key, response.data, USER_CACHE_TTL)
         return response.data
         
     except Exception as e:
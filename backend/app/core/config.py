@@ -28,6 +28,9 @@ class Settings(BaseSettings):
     SUPABASE_ANON_KEY: str
     SUPABASE_SERVICE_ROLE_KEY: str
     
+    # Direct Postgres (asyncpg) - Supavisor session pooler, optionnel
+    DATABASE_URL: str = ""
+    
     # OpenAI
     OPENAI_API_KEY: str
     OPENAI_MODEL: str = "gpt-4o"
@@ -0,0 +1,162 @@
+"""
+Redis cache helpers (fail-open)
+Si Redis est indisponible, les lectures ratent et les écritures sont ignorées:
+l'endpoint retombe simplement sur la base de données.
+
+LocalTTLCache: petit cache en mémoire du process, pour les valeurs lues à chaque
+requête qui tolèrent quelques secondes de retard (aucun aller-retour réseau).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import orjson
+import redis
+import redis.asyncio as aioredis
+from loguru import logger
+
+from app.core.config import settings
+
+
+_redis_client: Optional[redis.Redis] = None
+_async_redis_client: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Shared Redis client (connection pool géré par redis-py)"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=1,
+            socket_connect_timeout=1,
+        )
+    return _redis_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Shared asyncio Redis client, for async routes (ne bloque pas l'event loop)"""
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = aioredis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=1,
+            socket_connect_timeout=1,
+        )
+    return _async_redis_client
+
+
+def cache_get(key: str) -> Optional[Any]:
+    """Return the cached JSON value for key, or None on miss / Redis error"""
+    try:
+        raw = get_redis().get(key)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Cache read failed for {key}: {e}")
+        return None
+    return orjson.loads(raw) if raw is not None else None
+
+
+def cache_set(key: str, value: Any, ttl_seconds: int) -> None:
+    """Store value as JSON under key with a TTL; errors are logged and ignored"""
+    try:
+        get_redis().setex(key, ttl_seconds, orjson.dumps(value, default=str))
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Cache write failed for {key}: {e}")
+
+
+
+async def cache_get_async(key: str) -> Optional[Any]:
+    """Async variant of cache_get"""
+    try:
+        raw = await get_async_redis().get(key)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Cache read failed for {key}: {e}")
+        return None
+    return orjson.loads(raw) if raw is not None else None
+
+
+async def cache_set_async(key: str, value: Any, ttl_seconds: int) -> None:
+    """Async variant of cache_set"""
+    try:
+        await get_async_redis().setex(key, ttl_seconds, orjson.dumps(value, default=str))
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Cache write failed for {key}: {e}")
+
+
+async def cache_delete_async(*keys: str) -> None:
+    """Delete keys (invalidation after a write); errors are logged and ignored"""
+    try:
+        await get_async_redis().unlink(*keys)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Cache delete failed for {keys}: {e}")
+
+
+async def cache_set_tagged_async(key: str, value: Any, ttl_seconds: int, tag: str) -> None:
+    """cache_set_async + enregistre key dans le set tag (invalidation groupée)"""
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        pipe.setex(key, ttl_seconds, orjson.dumps(value, default=str))
+        pipe.sadd(tag, key)
+        pipe.expire(tag, ttl_seconds)
+        await pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Cache write failed for {key}: {e}")
+
+
+def cache_invalidate_tag(tag: str) -> None:
+    """Delete every key registered under tag, then the tag itself"""
+    try:
+        client = get_redis()
+        keys = client.smembers(tag)
+        client.unlink(tag, *keys)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Cache invalidation failed for {tag}: {e}")
+
+
+# ============================================
+# UNIFIED FEED PAGES
+# ============================================
+# Clés partagées entre /feed/unified (lecture) et les routes d'écriture
+# (likes, posts) qui doivent invalider les pages de l'organisation
+
+def unified_feed_cache_key(organization_id: str, user_id: str, limit: int, offset: int, include_stats: bool) -> str:
+    return f"feed:v1:{organization_id}:{user_id}:{limit}:{offset}:{int(include_stats)}"
+
+
+def unified_feed_cache_tag(organization_id: str) -> str:
+    return f"feed:v1:keys:{organization_id}"
+
+
+def invalidate_unified_feed(organization_id: str) -> None:
+    """Drop all cached unified feed pages of an organization (after a write)"""
+    cache_invalidate_tag(unified_feed_cache_tag(organization_id))
+
+
+class LocalTTLCache:
+    """In-process TTL cache, bounded to maxsize entries (oldest insert evicted first)"""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Les routes sync tournent dans le threadpool de Starlette
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
@@ -0,0 +1,62 @@
+"""
+Direct Postgres access (asyncpg) for hot paths that bypass PostgREST
+
+Cible le pooler Supavisor en mode session (port 5432). Les prepared statements
+côté serveur sont désactivés (statement_cache_size=0) et nommés de façon unique,
+pour rester compatible si DATABASE_URL pointe sur le pooler en mode transaction
+(port 6543) et éviter l'accumulation de statements par connexion.
+"""
+from typing import Optional
+from uuid import uuid4
+
+import asyncpg
+from loguru import logger
+
+from app.core.config import settings
+
+
+# Petit pool: Supabase limite le nombre de connexions par pooler
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 10
+POOL_MAX_INACTIVE_LIFETIME = 1800  # secondes (équivalent pool_recycle)
+
+
+class PostgresPool:
+    """Singleton asyncpg pool, opened on startup when DATABASE_URL is configured"""
+
+    _pool: Optional[asyncpg.Pool] = None
+
+    @classmethod
+    async def open(cls) -> Optional[asyncpg.Pool]:
+        """Create the pool (no-op when DATABASE_URL is not set)"""
+        if cls._pool is None and settings.DATABASE_URL:
+            cls._pool = await asyncpg.create_pool(
+                settings.DATABASE_URL,
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=POOL_MAX_INACTIVE_LIFETIME,
+                statement_cache_size=0,
+                connection_class=_PoolerSafeConnection,
+            )
+            logger.info("🐘 asyncpg pool ready")
+        return cls._pool
+
+    @classmethod
+    def get_pool(cls) -> Optional[asyncpg.Pool]:
+        """Return the pool, or None when direct SQL is not configured"""
+        return cls._pool
+
+    @classmethod
+    async def close(cls):
+        """Close all pooled connections"""
+        if cls._pool is not None:
+            await cls._pool.close()
+            cls._pool = None
+            logger.info("🔌 asyncpg pool closed")
+
+
+class _PoolerSafeConnection(asyncpg.Connection):
+    """Unique prepared statement names: no collision across pooled backends"""
+
+    def _get_unique_id(self, prefix: str) -> str:
+        return f"__asyncpg_{prefix}_{uuid4().hex}__"
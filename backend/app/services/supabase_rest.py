@@ -0,0 +1,101 @@
+"""
+Async Supabase REST (PostgREST) client sharing one pooled httpx.AsyncClient
+Évite un handshake TCP/TLS par requête sur les endpoints chauds (RPC du feed)
+"""
+from typing import Any, Dict, Optional
+
+import httpx
+import orjson
+from loguru import logger
+
+from app.core.config import settings
+
+
+# Pool de connexions partagé par toute l'application
+POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+POOL_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+
+class SupabaseRESTError(Exception):
+    """Raised when PostgREST returns a non-2xx response"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AsyncSupabaseREST:
+    """Thin async wrapper around the PostgREST endpoints used by hot routes"""
+
+    def __init__(self, http: httpx.AsyncClient):
+        self.http = http
+
+    async def rpc(self, function_name: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Call a Postgres function and return the decoded JSON payload"""
+        response = await self.http.post(f"/rpc/{function_name}", content=orjson.dumps(params or {}))
+        if response.is_error:
+            raise SupabaseRESTError(response.status_code, response.text)
+        return orjson.loads(response.content) if response.content else None
+
+    async def select(self, table: str, params: Dict[str, str]) -> Any:
+        """GET /{table} with raw PostgREST query params (select=..., col=eq.value)"""
+        response = await self.http.get(f"/{table}", params=params)
+        if response.is_error:
+            raise SupabaseRESTError(response.status_code, response.text)
+        return orjson.loads(response.content)
+
+    async def count(self, table: str, params: Dict[str, str]) -> int:
+        """Exact row count via HEAD + Prefer: count=exact (no rows transferred)"""
+        response = await self.http.head(
+            f"/{table}",
+            params={"select": "id", **params},
+            headers={"Prefer": "count=exact"},
+        )
+        if response.is_error:
+            raise SupabaseRESTError(response.status_code, response.text)
+        # Content-Range: "0-24/3573" ou "*/0"
+        content_range = response.headers.get("content-range", "*/0")
+        total = content_range.rsplit("/", 1)[-1]
+        return int(total) if total.isdigit() else 0
+
+
+def in_filter(values) -> str:
+    """PostgREST "in" filter value: in.(a,b,c)"""
+    return f"in.({','.join(str(v) for v in values)})"
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=f"{settings.SUPABASE_URL}/rest/v1",
+        headers={
+            "apikey": settings.SUPABASE_SERVICE_ROLE_KEY,
+            "Authorization": f"Bearer {settings.SUPABASE_SERVICE_ROLE_KEY}",
+            "Content-Type": "application/json",
+        },
+        limits=POOL_LIMITS,
+        timeout=POOL_TIMEOUT,
+        # HTTP/2 (négocié via ALPN sur https): les requêtes d'un asyncio.gather
+        # partagent une seule connexion TLS en streams multiplexés
+        http2=True,
+    )
+
+
+class SupabaseRESTClient:
+    """Singleton async REST client, opened on startup and closed on shutdown"""
+
+    _instance: Optional[AsyncSupabaseREST] = None
+
+    @classmethod
+    def get_client(cls) -> AsyncSupabaseREST:
+        """Get or create the shared client instance"""
+        if cls._instance is None:
+            cls._instance = AsyncSupabaseREST(_create_http_client())
+        return cls._instance
+
+    @classmethod
+    async def close(cls):
+        """Close the pooled connections"""
+        if cls._instance is not None:
+            await cls._instance.http.aclose()
+            cls._instance = None
+            logger.info("🔌 Supabase REST connection pool closed")
@@ -0,0 +1,126 @@
+"""
+Virality recalculation consumer (Postgres LISTEN/NOTIFY)
+
+Les triggers de add_virality_notify.sql émettent pg_notify('virality', post_id)
+à chaque like/save/commentaire. Ce consumer accumule les post_id dans un set et
+appelle recalc_virality_batch() toutes les FLUSH_INTERVAL secondes: 1000 likes/s
+sur un même post donnent ~2 recalculs/s au lieu de 1000.
+
+Un seul consumer par base: chaque worker uvicorn tente pg_try_advisory_lock,
+seul le détenteur du verrou écoute; les autres réessaient toutes les
+LOCK_RETRY_INTERVAL secondes et prennent le relais si sa connexion tombe.
+Sans DATABASE_URL, les endpoints planifient le recalcul Celery (debounce Redis).
+"""
+import asyncio
+from typing import Optional, Set
+
+import asyncpg
+from loguru import logger
+
+from app.core.config import settings
+from app.services.db_pool import PostgresPool
+
+
+VIRALITY_CHANNEL = "virality"
+FLUSH_INTERVAL = 0.5  # secondes
+LOCK_RETRY_INTERVAL = 30  # secondes
+# Clé pg_advisory_lock réservée au consumer virality (arbitraire, stable)
+VIRALITY_LOCK_KEY = 727_001
+
+
+class ViralityListener:
+    """Singleton LISTEN connection (one per database) + periodic batch flush"""
+
+    _connection: Optional[asyncpg.Connection] = None
+    _task: Optional[asyncio.Task] = None
+    _pending: Set[str] = set()
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """
+        True si le consumer NOTIFY est configuré (dans ce worker ou un autre):
+        les endpoints n'ont alors pas à planifier le recalcul eux-mêmes
+        """
+        return bool(settings.DATABASE_URL)
+
+    @classmethod
+    async def start(cls):
+        """Start competing for the consumer lock (no-op without DATABASE_URL)"""
+        if cls._task is not None:
+            return
+        if not cls.enabled() or PostgresPool.get_pool() is None:
+            logger.warning("⚠️ DATABASE_URL not set: virality recalculated through Celery")
+            return
+
+        cls._task = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls):
+        """Flush what is pending, then release the LISTEN connection (and the lock)"""
+        if cls._task is not None:
+            cls._task.cancel()
+            cls._task = None
+        await cls._close_connection()
+        await cls._flush()
+
+    @classmethod
+    async def _run(cls):
+        while True:
+            connection = None
+            try:
+                # LISTEN a besoin d'une connexion de session dédiée (hors pool),
+                # qui porte aussi le verrou advisory
+                connection = await asyncpg.connect(settings.DATABASE_URL, statement_cache_size=0)
+                if await connection.fetchval("SELECT pg_try_advisory_lock($1)", VIRALITY_LOCK_KEY):
+                    cls._connection = connection
+                    await connection.add_listener(VIRALITY_CHANNEL, cls._on_notify)
+                    logger.info("📡 Listening for virality notifications")
+                    await cls._flush_loop()
+                    logger.warning("⚠️ Virality LISTEN connection lost, retrying")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Virality listener error: {e}")
+            finally:
+                # Toujours fermer la connexion ouverte à cette itération (libère le verrou)
+                await cls._close_connection(connection)
+            await asyncio.sleep(LOCK_RETRY_INTERVAL)
+
+    @classmethod
+    async def _close_connection(cls, connection: Optional[asyncpg.Connection] = None):
+        """Close connection (default: the active LISTEN one) and forget it if active"""
+        connection = connection or cls._connection
+        if connection is not None and connection is cls._connection:
+            cls._connection = None
+        if connection is not None and not connection.is_closed():
+            await connection.close()
+
+    @classmethod
+    def _on_notify(cls, connection, pid, channel, payload):
+        cls._pending.add(payload)
+
+    @classmethod
+    async def _flush_loop(cls):
+        """Flush until the LISTEN connection closes (lock released with it)"""
+        while cls._connection is not None and not cls._connection.is_closed():
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await cls._flush()
+
+    @classmethod
+    async def _flush(cls):
+        if not cls._pending:
+            return
+        pool = PostgresPool.get_pool()
+        if pool is None:
+            return
+
+        post_ids, cls._pending = list(cls._pending), set()
+        try:
+            updated = await pool.fetchval(
+                "SELECT recalc_virality_batch($1::uuid[])", post_ids
+            )
+            logger.debug(f"📈 Virality recalculated for {updated}/{len(post_ids)} posts")
+        except Exception as e:
+            # Remettre en attente: retenté au prochain flush
+            cls._pending.update(post_ids)
+            logger.error(f"❌ Error recalculating virality batch: {e}")
@@ -20,6 +20,10 @@ celery_app.conf.beat_schedule = {
         "task": "publish_scheduled_posts",
         "schedule": crontab(minute="*"),  # Run every minute
     },
+    "refresh-feed-stats": {
+        "task": "refresh_feed_stats",
+        "schedule": 30.0,  # v_feed_stats est une vue matérialisée
+    },
 }
 
 # Celery configuration
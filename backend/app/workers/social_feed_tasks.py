@@ -6,6 +6,7 @@ from typing import Dict, Optional
 from datetime import datetime, timedelta
 from loguru import logger
 
+from app.services.cache import get_redis
 from app.workers.celery_app import celery_app
 from app.services.supabase_client import supabase
 
@@ -305,10 +306,30 @@ def recalculate_all_virality_scores_task(organization_id: Optional[str] = None):
 # TASK 4: Auto-recalculate on Engagement
 # ============================================
 
+# Fenêtre de debounce: un seul recalcul par post toutes les N secondes
+VIRALITY_DEBOUNCE_SECONDS = 10
+
 def trigger_virality_recalculation(post_id: str):
     """
-    Helper function appelée quand un post reçoit un engagement (like, comment, etc.)
-    À appeler depuis les endpoints d'engagement
+    Helper function pour planifier le recalcul Celery d'un post
+    Appelé par les endpoints d'engagement quand DATABASE_URL n'est pas configuré;
+    sinon les triggers NOTIFY de add_virality_notify.sql + ViralityListener s'en chargent.
+    
+    Debounce: le premier engagement planifie un recalcul dans VIRALITY_DEBOUNCE_SECONDS,
+    les suivants sur le même post dans cette fenêtre sont absorbés (le recalcul lit
+    les compteurs à jour au moment de son exécution).
     """
-    calculate_virality_score_task.delay(post_id)
+    try:
+        scheduled = get_redis().set(
+            f"virality:pending:{post_id}", 1, nx=True, ex=VIRALITY_DEBOUNCE_SECONDS
+        )
+    except Exception as e:
+        # Redis indisponible: pas de debounce, on recalcule quand même
+        logger.warning(f"⚠️ Virality debounce unavailable for post {post_id}: {e}")
+        scheduled = True
+    
+    if scheduled:
+        calculate_virality_score_task.apply_async(
+            args=[post_id], countdown=VIRALITY_DEBOUNCE_SECONDS
+        )
 
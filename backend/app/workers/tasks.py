@@ -10,6 +10,7 @@ from app.workers.celery_app import celery_app
 from app.services.supabase_client import supabase
 from app.services.ai_service import ai_service
 from app.services.event_logger import log_note_event
+from app.services.cache import invalidate_unified_feed
 from app.models.note import UserContext
 
 
@@ -167,6 +168,9 @@ def process_note_task(self, note_id: str):
         
         supabase.table("notes").update(update_data).eq("id", note_id).execute()
         
+        # La note (et le note_count du cluster) devient visible dans /feed/unified
+        invalidate_unified_feed(organization_id)
+        
         # Log cluster fusion event
         cluster_response = supabase.table("clusters").select("title").eq("id", cluster_id).single().execute()
         cluster_title = cluster_response.data.get("title", "Unknown Cluster") if cluster_response.data else "Unknown Cluster"
@@ -298,6 +302,7 @@ def generate_cluster_snapshot_task(self, cluster_id: str):
             ])
             
             supabase.table("clusters").update({"title": new_title}).eq("id", cluster_id).execute()
+            invalidate_unified_feed(organization_id)
         
         # ============================================
         # STEP 3: Prepare Notes for Synthesis
@@ -544,7 +549,7 @@ def publish_scheduled_posts_task():
         now = datetime.utcnow().isoformat()
         
         # 1. Fetch posts ready to be published
-        response = supabase.table("posts").select("id, scheduled_at").eq("status", "scheduled").lte("scheduled_at", now).execute()
+        response = supabase.table("posts").select("id, organization_id, scheduled_at").eq("status", "scheduled").lte("scheduled_at", now).execute()
         
         posts = response.data or []
         
@@ -552,6 +557,7 @@ def publish_scheduled_posts_task():
             return {"count": 0}
             
         count = 0
+        published_org_ids = set()
         from app.workers.social_feed_tasks import calculate_virality_score_task
         
         for post in posts:
@@ -566,12 +572,30 @@ def publish_scheduled_posts_task():
                 calculate_virality_score_task.delay(post["id"])
                 
                 logger.info(f"🚀 Published scheduled post {post['id']} (scheduled for {post['scheduled_at']})")
+                published_org_ids.add(post["organization_id"])
                 count += 1
             except Exception as e:
                 logger.error(f"Failed to publish post {post['id']}: {e}")
+        
+        for org_id in published_org_ids:
+            invalidate_unified_feed(org_id)
                 
         return {"count": count}
         
     except Exception as e:
         logger.error(f"❌ Error in publish_scheduled_posts_task: {e}")
         raise
+
+
+@celery_app.task(name="refresh_feed_stats")
+def refresh_feed_stats_task():
+    """
+    Periodic task: refresh the v_feed_stats materialized view.
+    REFRESH ... CONCURRENTLY, so feed reads are never blocked.
+    """
+    try:
+        supabase.rpc("refresh_feed_stats", {}).execute()
+        logger.debug("📊 v_feed_stats refreshed")
+    except Exception as e:
+        logger.error(f"❌ Error refreshing v_feed_stats: {e}")
+        raise
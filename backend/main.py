@@ -7,9 +7,13 @@ load_dotenv()
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from loguru import logger
 
 from app.core.config import settings
+from app.services.supabase_rest import SupabaseRESTClient
+from app.services.db_pool import PostgresPool
+from app.services.virality_listener import ViralityListener
 from app.api.routes import notes, clusters, pillars, users, board, organizations, auth, invitations, social_feed, unified_feed, chat, idea_groups, projects, integrations, applications
 
 # Initialize FastAPI app
@@ -19,6 +23,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -54,12 +59,25 @@ async def startup_event():
     logger.info("🚀 SIGMENT API Starting...")
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"Supabase URL: {settings.SUPABASE_URL}")
+    
+    # Pool HTTP partagé pour les appels PostgREST async
+    app.state.http = SupabaseRESTClient.get_client()
+    
+    # Pool asyncpg pour les chemins SQL directs (si DATABASE_URL est configuré)
+    app.state.db_pool = await PostgresPool.open()
+    
+    # Recalcul de viralité piloté par Postgres NOTIFY (un seul worker écoute, verrou advisory)
+    # Sans DATABASE_URL, les endpoints planifient le recalcul Celery
+    await ViralityListener.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("👋 SIGMENT API Shutting down...")
+    await SupabaseRESTClient.close()
+    await ViralityListener.stop()
+    await PostgresPool.close()
 
 
 @app.get("/")
@@ -0,0 +1,16 @@
+"""
+Pytest fixtures: environnement minimal pour importer l'app sans services externes
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Valeurs factices: les routes testées reçoivent un client Supabase simulé
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test.anon.key")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test.service.key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
+# Pas de Postgres direct: chemins REST + recalcul de viralité Celery
+os.environ["DATABASE_URL"] = ""
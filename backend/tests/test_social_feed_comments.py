@@ -0,0 +1,73 @@
+"""
+Social feed comment routes
+"""
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import CurrentUser, get_current_user, get_supabase_client
+from app.api.routes import social_feed
+
+
+class FakeSupabase:
+    """Minimal stand-in for the supabase-py client: rpc(name, params).execute()"""
+
+    def __init__(self, rpc_results):
+        self.rpc_results = rpc_results
+        self.rpc_calls = []
+
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=self.rpc_results[name]))
+
+
+@pytest.fixture
+def current_user():
+    return CurrentUser(id=uuid4(), email="user@example.com", organization_id=uuid4())
+
+
+def _client(supabase, current_user) -> TestClient:
+    app = FastAPI()
+    app.include_router(social_feed.router, prefix="/api/v1")
+    app.dependency_overrides[get_current_user] = lambda: current_user
+    app.dependency_overrides[get_supabase_client] = lambda: supabase
+    return TestClient(app)
+
+
+def test_create_comment_returns_rpc_row_with_counters(current_user, monkeypatch):
+    post_id = str(uuid4())
+    # Sans DATABASE_URL, le recalcul de viralité passe par Celery: capturé ici
+    scheduled = []
+    monkeypatch.setattr(social_feed, "trigger_virality_recalculation", scheduled.append)
+    # Ligne de create_comment_rpc: to_jsonb(post_comments) inclut likes_count / replies_count
+    row = {
+        "id": str(uuid4()),
+        "post_id": post_id,
+        "user_id": str(current_user.id),
+        "content": "Nice idea",
+        "media_url": None,
+        "poll_data": None,
+        "parent_comment_id": None,
+        "created_at": "2025-01-01T00:00:00+00:00",
+        "updated_at": "2025-01-01T00:00:00+00:00",
+        "likes_count": 0,
+        "replies_count": 0,
+        "user_info": {"first_name": "Ada", "last_name": "L", "email": "user@example.com"},
+    }
+    supabase = FakeSupabase({"create_comment_rpc": row})
+
+    response = _client(supabase, current_user).post(
+        f"/api/v1/feed/posts/{post_id}/comments", json={"content": "Nice idea"}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == row["id"]
+    assert body["likes_count"] == 0
+    assert body["replies_count"] == 0
+    assert body["is_liked"] is False
+    assert supabase.rpc_calls[0][0] == "create_comment_rpc"
+    assert scheduled == [post_id]
@@ -0,0 +1,67 @@
+-- ============================================
+-- COMMENT COUNTERS (dénormalisation)
+-- post_comments.likes_count / replies_count maintenus par triggers
+-- Remplace les COUNT(*) sur comment_likes et post_comments à chaque lecture/toggle
+-- ============================================
+
+-- ============================================
+-- 1. COLONNES
+-- ============================================
+
+ALTER TABLE post_comments
+    ADD COLUMN IF NOT EXISTS likes_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS replies_count INT NOT NULL DEFAULT 0;
+
+-- Backfill des compteurs existants
+UPDATE post_comments c SET
+    likes_count = (SELECT COUNT(*) FROM comment_likes cl WHERE cl.comment_id = c.id),
+    replies_count = (SELECT COUNT(*) FROM post_comments r WHERE r.parent_comment_id = c.id);
+
+
+-- ============================================
+-- 2. TRIGGERS
+-- ============================================
+
+CREATE OR REPLACE FUNCTION update_post_comment_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'comment_likes' THEN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE post_comments SET likes_count = likes_count + 1
+            WHERE id = NEW.comment_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE post_comments SET likes_count = GREATEST(0, likes_count - 1)
+            WHERE id = OLD.comment_id;
+        END IF;
+    END IF;
+
+    IF TG_TABLE_NAME = 'post_comments' THEN
+        IF TG_OP = 'INSERT' AND NEW.parent_comment_id IS NOT NULL THEN
+            UPDATE post_comments SET replies_count = replies_count + 1
+            WHERE id = NEW.parent_comment_id;
+        ELSIF TG_OP = 'DELETE' AND OLD.parent_comment_id IS NOT NULL THEN
+            UPDATE post_comments SET replies_count = GREATEST(0, replies_count - 1)
+            WHERE id = OLD.parent_comment_id;
+        END IF;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    ELSE
+        RETURN NEW;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_comment_likes_count ON comment_likes;
+CREATE TRIGGER update_comment_likes_count
+AFTER INSERT OR DELETE ON comment_likes
+FOR EACH ROW EXECUTE FUNCTION update_post_comment_counts();
+
+DROP TRIGGER IF EXISTS update_comment_replies_count ON post_comments;
+CREATE TRIGGER update_comment_replies_count
+AFTER INSERT OR DELETE ON post_comments
+FOR EACH ROW EXECUTE FUNCTION update_post_comment_counts();
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,47 @@
+-- ============================================
+-- COMMENT LIKE TOGGLE RPC
+-- Existence du commentaire + DELETE/INSERT + likes_count maintenu par le trigger
+-- update_comment_likes_count (add_comment_counters.sql), en une transaction
+-- Retourne NULL si le commentaire n'existe pas
+-- ============================================
+
+DROP FUNCTION IF EXISTS toggle_comment_like;
+
+CREATE OR REPLACE FUNCTION toggle_comment_like(
+    p_comment_id UUID,
+    p_user_id UUID
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_action TEXT;
+    v_count INT;
+BEGIN
+    PERFORM 1 FROM post_comments WHERE id = p_comment_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    DELETE FROM comment_likes WHERE comment_id = p_comment_id AND user_id = p_user_id;
+
+    IF FOUND THEN
+        v_action := 'unliked';
+    ELSE
+        INSERT INTO comment_likes (comment_id, user_id)
+        VALUES (p_comment_id, p_user_id)
+        ON CONFLICT (comment_id, user_id) DO NOTHING;
+        v_action := 'liked';
+    END IF;
+
+    -- likes_count déjà mis à jour par le trigger update_comment_likes_count
+    SELECT COALESCE(likes_count, 0) INTO v_count FROM post_comments WHERE id = p_comment_id;
+
+    RETURN jsonb_build_object('action', v_action, 'new_count', v_count);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION toggle_comment_like TO authenticated;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,49 @@
+-- ============================================
+-- COMMENT POLL VOTE - Atomic RPC
+-- Un seul UPDATE jsonb_set au lieu de SELECT + mutation Python + UPDATE
+-- Le garde "voter_ids ? user_id" supprime la course entre deux votes simultanés
+-- ============================================
+
+DROP FUNCTION IF EXISTS vote_comment_poll;
+
+CREATE OR REPLACE FUNCTION vote_comment_poll(
+    p_comment_id UUID,
+    p_user_id UUID,
+    p_option_index INT
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_poll_data JSONB;
+BEGIN
+    UPDATE post_comments
+    SET poll_data = jsonb_set(
+        jsonb_set(
+            jsonb_set(
+                poll_data,
+                '{total_votes}',
+                to_jsonb(COALESCE((poll_data->>'total_votes')::INT, 0) + 1)
+            ),
+            '{voter_ids}',
+            COALESCE(poll_data->'voter_ids', '[]'::jsonb) || to_jsonb(p_user_id::TEXT)
+        ),
+        ARRAY['options', p_option_index::TEXT, 'votes'],
+        to_jsonb(COALESCE((poll_data #>> ARRAY['options', p_option_index::TEXT, 'votes'])::INT, 0) + 1)
+    )
+    WHERE id = p_comment_id
+      AND poll_data IS NOT NULL
+      AND p_option_index >= 0
+      AND p_option_index < jsonb_array_length(COALESCE(poll_data->'options', '[]'::jsonb))
+      AND NOT (COALESCE(poll_data->'voter_ids', '[]'::jsonb) ? p_user_id::TEXT)
+    RETURNING poll_data INTO v_poll_data;
+
+    -- NULL: commentaire absent, pas de sondage, index invalide ou déjà voté
+    RETURN v_poll_data;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION vote_comment_poll TO authenticated;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,102 @@
+-- ============================================
+-- COMMENT TREE RPC
+-- Arbre complet des commentaires d'un post (jusqu'à p_max_depth) en une requête
+-- via CTE récursive: plus d'appel /replies par fil déplié côté client
+-- Requiert add_comment_counters.sql (colonnes likes_count / replies_count)
+-- ============================================
+
+DROP FUNCTION IF EXISTS get_comment_tree;
+
+CREATE OR REPLACE FUNCTION get_comment_tree(
+    p_post_id UUID,
+    p_current_user_id UUID DEFAULT NULL,
+    p_limit INT DEFAULT 20,
+    p_max_depth INT DEFAULT 3,
+    p_replies_limit INT DEFAULT 20,
+    p_after_created_at TIMESTAMPTZ DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    WITH RECURSIVE tree AS (
+        -- Niveau 0: page de commentaires racines (keyset, plus récents d'abord)
+        SELECT roots.*, 0 AS depth,
+               ARRAY[ROW_NUMBER() OVER (ORDER BY roots.created_at DESC, roots.id DESC)] AS path
+        FROM (
+            SELECT c.id, c.post_id, c.user_id, c.content, c.media_url, c.parent_comment_id,
+                   c.poll_data, c.likes_count, c.replies_count, c.created_at, c.updated_at
+            FROM post_comments c
+            WHERE c.post_id = p_post_id
+              AND c.parent_comment_id IS NULL
+              AND (p_after_created_at IS NULL OR (c.created_at, c.id) < (p_after_created_at, p_after_id))
+            ORDER BY c.created_at DESC, c.id DESC
+            LIMIT p_limit
+        ) roots
+
+        UNION ALL
+
+        -- Niveaux suivants: au plus p_replies_limit réponses par parent (plus anciennes d'abord)
+        SELECT child.id, child.post_id, child.user_id, child.content, child.media_url,
+               child.parent_comment_id, child.poll_data, child.likes_count, child.replies_count,
+               child.created_at, child.updated_at,
+               tree.depth + 1,
+               tree.path || child.position
+        FROM tree
+        CROSS JOIN LATERAL (
+            SELECT c.id, c.post_id, c.user_id, c.content, c.media_url, c.parent_comment_id,
+                   c.poll_data, c.likes_count, c.replies_count, c.created_at, c.updated_at,
+                   ROW_NUMBER() OVER (ORDER BY c.created_at ASC, c.id ASC) AS position
+            FROM post_comments c
+            WHERE c.parent_comment_id = tree.id
+            ORDER BY c.created_at ASC, c.id ASC
+            LIMIT p_replies_limit
+        ) child
+        WHERE tree.depth < p_max_depth
+    )
+    SELECT jsonb_agg(
+        jsonb_build_object(
+            'id', t.id,
+            'post_id', t.post_id,
+            'user_id', t.user_id,
+            'content', t.content,
+            'media_url', t.media_url,
+            'parent_comment_id', t.parent_comment_id,
+            'poll_data', t.poll_data,
+            'likes_count', t.likes_count,
+            'replies_count', t.replies_count,
+            'created_at', t.created_at,
+            'updated_at', t.updated_at,
+            'depth', t.depth,
+            'user_info', jsonb_build_object(
+                'id', u.id,
+                'first_name', u.first_name,
+                'last_name', u.last_name,
+                'avatar_url', u.avatar_url
+            ),
+            'is_liked', CASE WHEN p_current_user_id IS NOT NULL THEN
+                EXISTS (
+                    SELECT 1 FROM comment_likes cl
+                    WHERE cl.comment_id = t.id AND cl.user_id = p_current_user_id
+                )
+            ELSE FALSE END
+        )
+        ORDER BY t.path
+    )
+    INTO v_result
+    FROM tree t
+    JOIN users u ON u.id = t.user_id;
+
+    -- Liste à plat, ordre pré-fixe (parent puis ses réponses); chaque ligne porte depth
+    RETURN COALESCE(v_result, '[]');
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_comment_tree TO authenticated;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,210 @@
+-- ============================================
+-- COMMENTS KEYSET PAGINATION
+-- Remplace la pagination OFFSET par une pagination par curseur (created_at, id)
+-- Le coût d'une page devient O(limit) quelle que soit la profondeur
+-- Requiert add_comment_counters.sql (colonnes likes_count / replies_count)
+-- ============================================
+
+-- ============================================
+-- 1. INDEXES (ordre de pagination)
+-- ============================================
+
+-- Commentaires racines d'un post, triés par (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_post_comments_keyset
+ON post_comments(post_id, parent_comment_id, created_at DESC, id DESC);
+
+-- Réponses d'un commentaire, triées par (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_post_comments_parent_keyset
+ON post_comments(parent_comment_id, created_at, id);
+
+
+-- ============================================
+-- 2. ROOT COMMENTS (avec réponses imbriquées)
+-- ============================================
+
+DROP FUNCTION IF EXISTS get_comments_with_replies;
+
+CREATE OR REPLACE FUNCTION get_comments_with_replies(
+    p_post_id UUID,
+    p_current_user_id UUID DEFAULT NULL,
+    p_limit INT DEFAULT 20,
+    p_after_created_at TIMESTAMPTZ DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_sort TEXT DEFAULT 'recent'
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_ids UUID[];
+    v_result JSONB;
+BEGIN
+    -- Page keys: index range scan, stops after p_limit rows
+    IF p_sort = 'oldest' THEN
+        SELECT array_agg(k.id ORDER BY k.created_at ASC, k.id ASC)
+        INTO v_ids
+        FROM (
+            SELECT cm.id, cm.created_at
+            FROM post_comments cm
+            WHERE cm.post_id = p_post_id
+              AND cm.parent_comment_id IS NULL
+              AND (p_after_created_at IS NULL OR (cm.created_at, cm.id) > (p_after_created_at, p_after_id))
+            ORDER BY cm.created_at ASC, cm.id ASC
+            LIMIT p_limit
+        ) k;
+    ELSE
+        SELECT array_agg(k.id ORDER BY k.created_at DESC, k.id DESC)
+        INTO v_ids
+        FROM (
+            SELECT cm.id, cm.created_at
+            FROM post_comments cm
+            WHERE cm.post_id = p_post_id
+              AND cm.parent_comment_id IS NULL
+              AND (p_after_created_at IS NULL OR (cm.created_at, cm.id) < (p_after_created_at, p_after_id))
+            ORDER BY cm.created_at DESC, cm.id DESC
+            LIMIT p_limit
+        ) k;
+    END IF;
+
+    IF v_ids IS NULL THEN
+        RETURN '[]'::jsonb;
+    END IF;
+
+    SELECT jsonb_agg(to_jsonb(c) - 'page_position' ORDER BY c.page_position)
+    INTO v_result
+    FROM (
+        SELECT
+            page.ord AS page_position,
+            cm.id,
+            cm.post_id,
+            cm.user_id,
+            cm.content,
+            cm.media_url,
+            cm.parent_comment_id,
+            cm.created_at,
+            cm.updated_at,
+            cm.likes_count,
+            -- User Info
+            jsonb_build_object(
+                'id', u.id,
+                'first_name', u.first_name,
+                'last_name', u.last_name,
+                'avatar_url', u.avatar_url
+            ) as user_info,
+            -- Is Liked
+            CASE WHEN p_current_user_id IS NOT NULL THEN
+                EXISTS (
+                    SELECT 1 FROM comment_likes cl
+                    WHERE cl.comment_id = cm.id AND cl.user_id = p_current_user_id
+                )
+            ELSE FALSE END as is_liked,
+            cm.poll_data,
+            -- Replies
+            COALESCE(
+                (
+                    SELECT jsonb_agg(to_jsonb(r))
+                    FROM (
+                        SELECT
+                            rep.id,
+                            rep.post_id,
+                            rep.user_id,
+                            rep.content,
+                            rep.media_url,
+                            rep.parent_comment_id,
+                            rep.created_at,
+                            rep.updated_at,
+                            rep.likes_count,
+                            jsonb_build_object(
+                                'id', ru.id,
+                                'first_name', ru.first_name,
+                                'last_name', ru.last_name,
+                                'avatar_url', ru.avatar_url
+                            ) as user_info,
+                            CASE WHEN p_current_user_id IS NOT NULL THEN
+                                EXISTS (
+                                    SELECT 1 FROM comment_likes cl2
+                                    WHERE cl2.comment_id = rep.id AND cl2.user_id = p_current_user_id
+                                )
+                            ELSE FALSE END as is_liked,
+                            rep.poll_data,
+                            0 as replies_count
+                        FROM post_comments rep
+                        JOIN users ru ON ru.id = rep.user_id
+                        WHERE rep.parent_comment_id = cm.id
+                        ORDER BY rep.created_at ASC, rep.id ASC
+                    ) r
+                ),
+                '[]'::jsonb
+            ) as replies,
+            cm.replies_count
+        FROM unnest(v_ids) WITH ORDINALITY AS page(id, ord)
+        JOIN post_comments cm ON cm.id = page.id
+        JOIN users u ON u.id = cm.user_id
+    ) c;
+
+    RETURN COALESCE(v_result, '[]');
+END;
+$$;
+
+
+-- ============================================
+-- 3. REPLIES (triées du plus ancien au plus récent)
+-- ============================================
+
+DROP FUNCTION IF EXISTS get_comment_replies_optimized;
+
+CREATE OR REPLACE FUNCTION get_comment_replies_optimized(
+    p_comment_id UUID,
+    p_current_user_id UUID DEFAULT NULL,
+    p_limit INT DEFAULT 20,
+    p_after_created_at TIMESTAMPTZ DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    SELECT jsonb_agg(to_jsonb(r))
+    INTO v_result
+    FROM (
+        SELECT
+            rep.id,
+            rep.post_id,
+            rep.user_id,
+            rep.content,
+            rep.media_url,
+            rep.parent_comment_id,
+            rep.created_at,
+            rep.updated_at,
+            rep.likes_count,
+            rep.poll_data,
+            jsonb_build_object(
+                'id', ru.id,
+                'first_name', ru.first_name,
+                'last_name', ru.last_name,
+                'avatar_url', ru.avatar_url
+            ) as user_info,
+            CASE WHEN p_current_user_id IS NOT NULL THEN
+                EXISTS (
+                    SELECT 1 FROM comment_likes cl2
+                    WHERE cl2.comment_id = rep.id AND cl2.user_id = p_current_user_id
+                )
+            ELSE FALSE END as is_liked,
+            0 as replies_count,
+            '[]'::jsonb as replies
+        FROM post_comments rep
+        JOIN users ru ON ru.id = rep.user_id
+        WHERE rep.parent_comment_id = p_comment_id
+          AND (p_after_created_at IS NULL OR (rep.created_at, rep.id) > (p_after_created_at, p_after_id))
+        ORDER BY rep.created_at ASC, rep.id ASC
+        LIMIT p_limit
+    ) r;
+
+    RETURN COALESCE(v_result, '[]');
+END;
+$$;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
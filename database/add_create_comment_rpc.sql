@@ -0,0 +1,55 @@
+-- ============================================
+-- CREATE COMMENT RPC
+-- Vérifie post/parent, insère le commentaire et renvoie user_info
+-- en un seul aller-retour (au lieu de 3-4 requêtes séquentielles)
+-- ============================================
+
+DROP FUNCTION IF EXISTS create_comment_rpc;
+
+CREATE OR REPLACE FUNCTION create_comment_rpc(
+    p_post_id UUID,
+    p_user_id UUID,
+    p_content TEXT,
+    p_parent_id UUID DEFAULT NULL,
+    p_media_url TEXT DEFAULT NULL,
+    p_poll_data JSONB DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    WITH v AS (
+        SELECT 1
+        WHERE EXISTS (SELECT 1 FROM posts WHERE id = p_post_id)
+          AND (p_parent_id IS NULL OR EXISTS (SELECT 1 FROM post_comments WHERE id = p_parent_id))
+    ),
+    ins AS (
+        INSERT INTO post_comments (post_id, user_id, content, parent_comment_id, media_url, poll_data)
+        SELECT p_post_id, p_user_id, p_content, p_parent_id, p_media_url, p_poll_data
+        FROM v
+        RETURNING *
+    )
+    SELECT to_jsonb(ins) || jsonb_build_object(
+        'user_info', jsonb_build_object(
+            'id', u.id,
+            'email', u.email,
+            'first_name', u.first_name,
+            'last_name', u.last_name,
+            'avatar_url', u.avatar_url
+        )
+    )
+    INTO v_result
+    FROM ins
+    LEFT JOIN users u ON u.id = ins.user_id;
+
+    -- NULL: post ou commentaire parent introuvable
+    RETURN v_result;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION create_comment_rpc TO authenticated;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
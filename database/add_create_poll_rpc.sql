@@ -0,0 +1,64 @@
+-- ============================================
+-- CREATE POLL RPC
+-- Vérification auteur + poll unique, insertion poll + options, flag posts.has_poll
+-- en une seule requête atomique (au lieu de 5 allers-retours)
+-- ============================================
+
+DROP FUNCTION IF EXISTS create_poll_rpc;
+
+CREATE OR REPLACE FUNCTION create_poll_rpc(
+    p_post_id UUID,
+    p_user_id UUID,
+    p_question TEXT,
+    p_options TEXT[],
+    p_allow_multiple BOOLEAN DEFAULT FALSE,
+    p_expires_at TIMESTAMPTZ DEFAULT NULL,
+    p_color TEXT DEFAULT '#374151'
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    WITH auth AS (
+        SELECT 1
+        FROM posts
+        WHERE id = p_post_id
+          AND user_id = p_user_id
+          AND NOT EXISTS (SELECT 1 FROM polls WHERE post_id = p_post_id)
+    ),
+    p AS (
+        INSERT INTO polls (post_id, question, allow_multiple, color, expires_at)
+        SELECT p_post_id, p_question, p_allow_multiple, p_color, p_expires_at
+        FROM auth
+        RETURNING *
+    ),
+    o AS (
+        INSERT INTO poll_options (poll_id, option_text, display_order)
+        SELECT p.id, t.option_text, (t.ord - 1)::INT
+        FROM p, unnest(p_options) WITH ORDINALITY AS t(option_text, ord)
+        RETURNING *
+    ),
+    upd AS (
+        UPDATE posts SET has_poll = TRUE
+        WHERE id = p_post_id AND EXISTS (SELECT 1 FROM p)
+    )
+    SELECT to_jsonb(p) || jsonb_build_object(
+        'options', (
+            SELECT COALESCE(jsonb_agg(to_jsonb(o) ORDER BY o.display_order), '[]'::jsonb)
+            FROM o
+        )
+    )
+    INTO v_result
+    FROM p;
+
+    -- NULL: post introuvable, pas l'auteur, ou sondage déjà existant
+    RETURN v_result;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION create_poll_rpc TO authenticated;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
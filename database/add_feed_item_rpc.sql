@@ -0,0 +1,94 @@
+-- ============================================
+-- FEED ITEM DETAILS RPC
+-- Détail d'un cluster ou d'une note (pilier, like, aperçu, auteur) assemblé
+-- en JSONB côté serveur: une requête au lieu de 2-3 appels PostgREST
+-- Même forme que la réponse de GET /feed/unified/{item_type}/{item_id}
+-- ============================================
+
+DROP FUNCTION IF EXISTS get_feed_item;
+
+CREATE OR REPLACE FUNCTION get_feed_item(
+    p_type TEXT,
+    p_id UUID,
+    p_organization_id UUID,
+    p_user_id UUID
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT CASE p_type
+        WHEN 'cluster' THEN (
+            SELECT jsonb_build_object(
+                'id', c.id,
+                'title', c.title,
+                'note_count', COALESCE(c.note_count, 0),
+                'pillar_id', c.pillar_id,
+                'pillar_name', pl.name,
+                'pillar_color', pl.color,
+                'likes_count', COALESCE(c.likes_count, 0),
+                'comments_count', COALESCE(c.comments_count, 0),
+                'is_liked', EXISTS (
+                    SELECT 1 FROM cluster_likes cl
+                    WHERE cl.cluster_id = c.id AND cl.user_id = p_user_id
+                ),
+                'preview_notes', COALESCE((
+                    SELECT jsonb_agg(jsonb_build_object(
+                        'id', pn.id,
+                        'content', COALESCE(NULLIF(pn.content_clarified, ''), pn.content_raw)
+                    ))
+                    FROM (
+                        SELECT n.id, n.content_clarified, n.content_raw
+                        FROM notes n
+                        WHERE n.cluster_id = c.id
+                        LIMIT 5
+                    ) pn
+                ), '[]'::jsonb),
+                'created_at', c.created_at,
+                'last_updated_at', c.last_updated_at
+            )
+            FROM clusters c
+            LEFT JOIN pillars pl ON pl.id = c.pillar_id
+            WHERE c.id = p_id AND c.organization_id = p_organization_id
+        )
+        WHEN 'note' THEN (
+            SELECT jsonb_build_object(
+                'id', n.id,
+                'title', n.title_clarified,
+                'content', COALESCE(NULLIF(n.content_clarified, ''), n.content_raw),
+                'content_raw', n.content_raw,
+                'content_clarified', n.content_clarified,
+                'status', n.status,
+                'pillar_id', n.pillar_id,
+                'pillar_name', pl.name,
+                'pillar_color', pl.color,
+                'cluster_id', n.cluster_id,
+                'ai_relevance_score', n.ai_relevance_score,
+                'user_id', n.user_id,
+                'user_info', jsonb_build_object(
+                    'email', u.email,
+                    'first_name', u.first_name,
+                    'last_name', u.last_name,
+                    'avatar_url', u.avatar_url
+                ),
+                'likes_count', COALESCE(n.likes_count, 0),
+                'comments_count', COALESCE(n.comments_count, 0),
+                'is_liked', EXISTS (
+                    SELECT 1 FROM note_likes nl
+                    WHERE nl.note_id = n.id AND nl.user_id = p_user_id
+                ),
+                'created_at', n.created_at,
+                'processed_at', n.processed_at
+            )
+            FROM notes n
+            LEFT JOIN pillars pl ON pl.id = n.pillar_id
+            LEFT JOIN users u ON u.id = n.user_id
+            WHERE n.id = p_id AND n.organization_id = p_organization_id
+        )
+    END;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_feed_item TO authenticated;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,87 @@
+-- ============================================
+-- FEED LIKE TOGGLE RPCs (notes + clusters)
+-- Vérification org + DELETE/INSERT + nouveau likes_count en une transaction
+-- (au lieu de 4 allers-retours: existence, like existant, écriture, re-lecture)
+-- Retourne NULL si l'item n'existe pas dans l'organisation
+-- ============================================
+
+DROP FUNCTION IF EXISTS toggle_note_like;
+
+CREATE OR REPLACE FUNCTION toggle_note_like(
+    p_note_id UUID,
+    p_user_id UUID,
+    p_organization_id UUID
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_action TEXT;
+    v_count INT;
+BEGIN
+    PERFORM 1 FROM notes WHERE id = p_note_id AND organization_id = p_organization_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    DELETE FROM note_likes WHERE note_id = p_note_id AND user_id = p_user_id;
+
+    IF FOUND THEN
+        v_action := 'unliked';
+    ELSE
+        INSERT INTO note_likes (note_id, user_id)
+        VALUES (p_note_id, p_user_id)
+        ON CONFLICT (note_id, user_id) DO NOTHING;
+        v_action := 'liked';
+    END IF;
+
+    -- likes_count déjà mis à jour par le trigger update_note_likes_count
+    SELECT COALESCE(likes_count, 0) INTO v_count FROM notes WHERE id = p_note_id;
+
+    RETURN jsonb_build_object('action', v_action, 'new_count', v_count);
+END;
+$$;
+
+
+DROP FUNCTION IF EXISTS toggle_cluster_like;
+
+CREATE OR REPLACE FUNCTION toggle_cluster_like(
+    p_cluster_id UUID,
+    p_user_id UUID,
+    p_organization_id UUID
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_action TEXT;
+    v_count INT;
+BEGIN
+    PERFORM 1 FROM clusters WHERE id = p_cluster_id AND organization_id = p_organization_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    DELETE FROM cluster_likes WHERE cluster_id = p_cluster_id AND user_id = p_user_id;
+
+    IF FOUND THEN
+        v_action := 'unliked';
+    ELSE
+        INSERT INTO cluster_likes (cluster_id, user_id)
+        VALUES (p_cluster_id, p_user_id)
+        ON CONFLICT (cluster_id, user_id) DO NOTHING;
+        v_action := 'liked';
+    END IF;
+
+    -- likes_count déjà mis à jour par le trigger update_cluster_likes_count
+    SELECT COALESCE(likes_count, 0) INTO v_count FROM clusters WHERE id = p_cluster_id;
+
+    RETURN jsonb_build_object('action', v_action, 'new_count', v_count);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION toggle_note_like TO authenticated;
+GRANT EXECUTE ON FUNCTION toggle_cluster_like TO authenticated;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,21 @@
+-- ============================================
+-- FEED LOOKUP INDEXES
+-- Index manquants pour les requêtes chaudes du feed unifié et des sondages
+-- (les autres existent déjà: idx_notes_orphan, idx_notes_user_date,
+-- idx_notes_feed_optimized, idx_clusters_feed_optimized, idx_posts_feed_optimized,
+-- idx_posts_feed_time_optimized, unique_vote_per_option)
+-- ============================================
+
+-- Votes de l'utilisateur parmi un ensemble d'options
+-- (poll_votes?user_id=eq.X&poll_option_id=in.(...)): index-only scan
+CREATE INDEX IF NOT EXISTS idx_poll_votes_user_option
+ON poll_votes(user_id, poll_option_id);
+
+-- Bras "petits clusters" (<2 notes) de get_unified_feed_optimized
+CREATE INDEX IF NOT EXISTS idx_clusters_small
+ON clusters(organization_id)
+WHERE note_count < 2;
+
+-- Notes de l'utilisateur dans son organisation (bras "mine")
+CREATE INDEX IF NOT EXISTS idx_notes_org_user_date
+ON notes(organization_id, user_id, created_at DESC);
@@ -0,0 +1,190 @@
+-- ============================================
+-- POLL RPCs
+-- Vote en une seule transaction: validation + suppression/insertion des votes
+-- + état final du sondage (au lieu de 5 requêtes + re-fetch get_poll)
+-- ============================================
+
+-- ============================================
+-- 1. PAYLOAD (forme de PollResponse)
+-- ============================================
+
+DROP FUNCTION IF EXISTS get_poll_payload;
+
+CREATE OR REPLACE FUNCTION get_poll_payload(
+    p_poll_id UUID,
+    p_user_id UUID
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    SELECT jsonb_build_object(
+        'id', p.id,
+        'post_id', p.post_id,
+        'question', p.question,
+        'options', COALESCE(opts.options, '[]'::jsonb),
+        'allow_multiple', COALESCE(p.allow_multiple, FALSE),
+        'total_votes', COALESCE(p.total_votes, 0),
+        'color', COALESCE(p.color, '#374151'),
+        'expires_at', p.expires_at,
+        'is_expired', p.expires_at IS NOT NULL AND p.expires_at < NOW(),
+        'user_voted', COALESCE(jsonb_array_length(opts.user_votes), 0) > 0,
+        'user_votes', COALESCE(opts.user_votes, '[]'::jsonb),
+        'created_at', p.created_at
+    )
+    INTO v_result
+    FROM polls p
+    LEFT JOIN LATERAL (
+        SELECT
+            jsonb_agg(
+                jsonb_build_object(
+                    'id', o.id,
+                    'text', o.option_text,
+                    'votes_count', COALESCE(o.votes_count, 0),
+                    'percentage', CASE WHEN COALESCE(p.total_votes, 0) > 0
+                        THEN ROUND(100.0 * COALESCE(o.votes_count, 0) / p.total_votes, 1)::FLOAT
+                        ELSE 0.0 END,
+                    'is_voted', v.poll_option_id IS NOT NULL
+                )
+                ORDER BY o.display_order
+            ) AS options,
+            jsonb_agg(o.id) FILTER (WHERE v.poll_option_id IS NOT NULL) AS user_votes
+        FROM poll_options o
+        LEFT JOIN poll_votes v
+            ON v.poll_option_id = o.id AND v.user_id = p_user_id
+        WHERE o.poll_id = p.id
+    ) opts ON TRUE
+    WHERE p.id = p_poll_id;
+
+    RETURN v_result;
+END;
+$$;
+
+
+-- ============================================
+-- 2. VOTE
+-- ============================================
+
+DROP FUNCTION IF EXISTS vote_poll;
+
+CREATE OR REPLACE FUNCTION vote_poll(
+    p_poll_id UUID,
+    p_user_id UUID,
+    p_option_ids UUID[]
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_poll polls%ROWTYPE;
+    v_invalid UUID[];
+BEGIN
+    -- KEY SHARE: le sondage ne peut pas être supprimé pendant le vote, sans bloquer
+    -- l'UPDATE polls.total_votes du trigger (un FOR SHARE s'y upgrade -> deadlock)
+    SELECT * INTO v_poll FROM polls WHERE id = p_poll_id FOR KEY SHARE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Poll not found';
+    END IF;
+
+    IF v_poll.expires_at IS NOT NULL AND v_poll.expires_at < NOW() THEN
+        RAISE EXCEPTION 'Poll has expired';
+    END IF;
+
+    -- Différence d'ensembles en une passe: toutes les options invalides d'un coup
+    SELECT array_agg(DISTINCT opt_id ORDER BY opt_id) INTO v_invalid
+    FROM unnest(p_option_ids) AS opt_id
+    WHERE opt_id NOT IN (
+        SELECT id FROM poll_options WHERE poll_id = p_poll_id
+    );
+
+    IF v_invalid IS NOT NULL THEN
+        RAISE EXCEPTION 'Invalid option IDs: %', array_to_string(v_invalid, ', ');
+    END IF;
+
+    IF NOT COALESCE(v_poll.allow_multiple, FALSE) THEN
+        IF cardinality(p_option_ids) > 1 THEN
+            RAISE EXCEPTION 'This poll only allows one vote';
+        END IF;
+
+        -- Choix unique: retirer les votes précédents (sauf l'option re-choisie)
+        DELETE FROM poll_votes v
+        USING poll_options o
+        WHERE v.poll_option_id = o.id
+          AND o.poll_id = p_poll_id
+          AND v.user_id = p_user_id
+          AND v.poll_option_id <> ALL(p_option_ids);
+    END IF;
+
+    INSERT INTO poll_votes (poll_option_id, user_id)
+    SELECT opt_id, p_user_id
+    FROM unnest(p_option_ids) AS opt_id
+    ON CONFLICT (poll_option_id, user_id) DO NOTHING;
+
+    -- Les triggers ont mis à jour votes_count / total_votes: état final
+    RETURN get_poll_payload(p_poll_id, p_user_id);
+END;
+$$;
+
+
+-- ============================================
+-- 3. UNVOTE
+-- ============================================
+
+DROP FUNCTION IF EXISTS unvote_poll;
+
+CREATE OR REPLACE FUNCTION unvote_poll(
+    p_poll_id UUID,
+    p_user_id UUID
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- KEY SHARE: compatible avec l'UPDATE polls.total_votes du trigger (cf. vote_poll)
+    PERFORM 1 FROM polls WHERE id = p_poll_id FOR KEY SHARE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Poll not found';
+    END IF;
+
+    DELETE FROM poll_votes v
+    USING poll_options o
+    WHERE v.poll_option_id = o.id
+      AND o.poll_id = p_poll_id
+      AND v.user_id = p_user_id;
+
+    RETURN get_poll_payload(p_poll_id, p_user_id);
+END;
+$$;
+
+
+-- ============================================
+-- 4. GET POLL BY POST (percentages / is_voted calculés en SQL)
+-- ============================================
+
+DROP FUNCTION IF EXISTS get_poll_full;
+
+CREATE OR REPLACE FUNCTION get_poll_full(
+    p_post_id UUID,
+    p_user_id UUID
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT get_poll_payload(p.id, p_user_id)
+    FROM polls p
+    WHERE p.post_id = p_post_id;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_poll_payload TO authenticated;
+GRANT EXECUTE ON FUNCTION get_poll_full TO authenticated;
+GRANT EXECUTE ON FUNCTION vote_poll TO authenticated;
+GRANT EXECUTE ON FUNCTION unvote_poll TO authenticated;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,62 @@
+-- ============================================
+-- POST DETAIL RPC
+-- Un seul aller-retour pour un post: user_info + is_liked + is_saved
+-- Remplace post+users, puis post_likes, puis post_saves (3 requêtes)
+-- ============================================
+
+DROP FUNCTION IF EXISTS get_post_detail;
+
+CREATE OR REPLACE FUNCTION get_post_detail(
+    p_post_id UUID,
+    p_user_id UUID,
+    p_org_id UUID
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    SELECT jsonb_build_object(
+        'id', p.id,
+        'content', p.content,
+        'post_type', p.post_type,
+        'media_urls', p.media_urls,
+        'user_id', p.user_id,
+        'user_info', jsonb_build_object(
+            'id', u.id,
+            'email', u.email,
+            'first_name', u.first_name,
+            'last_name', u.last_name,
+            'avatar_url', u.avatar_url
+        ),
+        'likes_count', COALESCE(p.likes_count, 0),
+        'comments_count', COALESCE(p.comments_count, 0),
+        'saves_count', COALESCE(p.saves_count, 0),
+        'shares_count', COALESCE(p.shares_count, 0),
+        'is_liked', EXISTS (
+            SELECT 1 FROM post_likes pl
+            WHERE pl.post_id = p.id AND pl.user_id = p_user_id
+        ),
+        'is_saved', EXISTS (
+            SELECT 1 FROM post_saves ps
+            WHERE ps.post_id = p.id AND ps.user_id = p_user_id
+        ),
+        'created_at', p.created_at,
+        'updated_at', p.updated_at
+    )
+    INTO v_result
+    FROM posts p
+    LEFT JOIN users u ON u.id = p.user_id
+    WHERE p.id = p_post_id
+      AND p.organization_id = p_org_id;
+
+    RETURN v_result;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_post_detail TO authenticated;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
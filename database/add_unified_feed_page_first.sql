@@ -0,0 +1,259 @@
+-- ============================================
+-- UNIFIED FEED - PAGE FIRST
+-- Même contrat que add_unified_feed_optimized.sql (signature + colonnes)
+-- Le UNION ALL ne porte plus que les clés de tri (type, id, sort_date, score):
+-- ORDER BY + LIMIT s'appliquent sur des lignes légères, puis seules les
+-- p_limit lignes de la page sont enrichies (contenu, is_liked, preview_notes,
+-- auteur...) au lieu de toutes les lignes candidates de l'organisation
+-- ============================================
+
+DROP FUNCTION IF EXISTS get_unified_feed_optimized(UUID, UUID, INTEGER, INTEGER);
+
+CREATE OR REPLACE FUNCTION get_unified_feed_optimized(
+    p_organization_id UUID,
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 50,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    item_type TEXT,
+    id UUID,
+    -- Common fields
+    sort_date TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE,
+    likes_count INTEGER,
+    comments_count INTEGER,
+    is_liked BOOLEAN,
+    is_mine BOOLEAN,
+    -- Cluster-specific fields
+    title TEXT,
+    note_count INTEGER,
+    velocity_score FLOAT,
+    last_updated_at TIMESTAMP WITH TIME ZONE,
+    preview_notes JSONB,
+    -- Note-specific fields
+    content TEXT,
+    content_raw TEXT,
+    content_clarified TEXT,
+    title_clarified TEXT,
+    status TEXT,
+    cluster_id UUID,
+    ai_relevance_score FLOAT,
+    processed_at TIMESTAMP WITH TIME ZONE,
+    user_id UUID,
+    -- Post-specific fields
+    post_type TEXT,
+    media_urls TEXT[],
+    has_poll BOOLEAN,
+    saves_count INTEGER,
+    shares_count INTEGER,
+    virality_score FLOAT,
+    is_saved BOOLEAN,
+    user_info JSONB,
+    -- Pillar info (shared)
+    pillar_id UUID,
+    pillar_name TEXT,
+    pillar_color TEXT
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH candidates AS (
+        -- ============================================
+        -- PART A: CLUSTERS (Active in last 48h, 2+ notes)
+        -- ============================================
+        SELECT
+            'CLUSTER'::TEXT AS item_type,
+            c.id,
+            c.last_updated_at AS sort_date,
+            c.velocity_score AS ranking_base_score
+        FROM clusters c
+        WHERE
+            c.organization_id = p_organization_id
+            AND c.last_updated_at > NOW() - INTERVAL '48 hours'
+            AND c.note_count >= 2
+
+        UNION ALL
+
+        -- ============================================
+        -- PART B: NOTES (Orphan OR Mine OR from small clusters)
+        -- ============================================
+        SELECT
+            'NOTE'::TEXT,
+            n.id,
+            COALESCE(n.processed_at, n.created_at),
+            -- ai_relevance_score is 0-10, normalize to 0-100
+            COALESCE(n.ai_relevance_score * 10, 0.0)
+        FROM notes n
+        WHERE
+            n.status IN ('processed', 'review', 'approved', 'refused', 'archived')
+            -- Un bras indexé par condition au lieu d'un OR sur LEFT JOIN
+            -- (qui force un scan de toutes les notes de l'organisation)
+            AND n.id IN (
+                -- Orphan notes (idx_notes_orphan)
+                SELECT o.id FROM notes o
+                WHERE o.organization_id = p_organization_id AND o.cluster_id IS NULL
+                UNION
+                -- My notes, always visible to me (idx_notes_user_date)
+                SELECT m.id FROM notes m
+                WHERE m.user_id = p_user_id AND m.organization_id = p_organization_id
+                UNION
+                -- Notes from small clusters (<2 notes), "exploded" into individual notes (idx_notes_cluster)
+                SELECT s.id FROM clusters sc
+                JOIN notes s ON s.cluster_id = sc.id
+                WHERE sc.organization_id = p_organization_id AND sc.note_count < 2
+            )
+
+        UNION ALL
+
+        -- ============================================
+        -- PART C: POSTS (Standard posts, not linked_idea, last 30 days)
+        -- ============================================
+        SELECT
+            'POST'::TEXT,
+            pt.id,
+            pt.created_at,
+            -- virality_score capped at 100
+            LEAST(COALESCE(pt.virality_score, 0.0), 100.0)
+        FROM posts pt
+        WHERE
+            pt.organization_id = p_organization_id
+            AND pt.post_type != 'linked_idea'
+            AND COALESCE(pt.status, 'active') != 'scheduled'
+            AND pt.created_at > NOW() - INTERVAL '30 days'
+    ),
+    page AS (
+        -- Tri + pagination sur les clés seulement
+        SELECT r.*
+        FROM (
+            SELECT
+                cd.*,
+                -- Algorithmic ranking: base_score + freshness_boost
+                (
+                    cd.ranking_base_score +
+                    CASE
+                        WHEN cd.sort_date > NOW() - INTERVAL '1 hour' THEN 30
+                        WHEN cd.sort_date > NOW() - INTERVAL '6 hours' THEN 25
+                        WHEN cd.sort_date > NOW() - INTERVAL '12 hours' THEN 20
+                        WHEN cd.sort_date > NOW() - INTERVAL '24 hours' THEN 15
+                        WHEN cd.sort_date > NOW() - INTERVAL '48 hours' THEN 10
+                        ELSE 0
+                    END
+                ) AS total_score
+            FROM candidates cd
+        ) r
+        ORDER BY r.total_score DESC, r.sort_date DESC
+        LIMIT p_limit
+        OFFSET p_offset
+    ),
+    -- Likes / saves de l'utilisateur pour les ids de la page: un lot par table
+    -- (semi-join sur la page au lieu d'une sous-requête EXISTS par ligne)
+    liked AS (
+        SELECT 'CLUSTER'::TEXT AS item_type, cl.cluster_id AS id
+        FROM cluster_likes cl
+        WHERE cl.user_id = p_user_id
+          AND cl.cluster_id IN (SELECT pc.id FROM page pc WHERE pc.item_type = 'CLUSTER')
+        UNION
+        SELECT 'NOTE'::TEXT, nl.note_id
+        FROM note_likes nl
+        WHERE nl.user_id = p_user_id
+          AND nl.note_id IN (SELECT pn.id FROM page pn WHERE pn.item_type = 'NOTE')
+        UNION
+        SELECT 'POST'::TEXT, pl.post_id
+        FROM post_likes pl
+        WHERE pl.user_id = p_user_id
+          AND pl.post_id IN (SELECT pp.id FROM page pp WHERE pp.item_type = 'POST')
+    ),
+    saved AS (
+        SELECT DISTINCT ps.post_id AS id
+        FROM post_saves ps
+        WHERE ps.user_id = p_user_id
+          AND ps.post_id IN (SELECT pp.id FROM page pp WHERE pp.item_type = 'POST')
+    )
+    -- ============================================
+    -- ENRICHMENT (p_limit lignes au plus)
+    -- ============================================
+    SELECT
+        pg.item_type,
+        pg.id,
+        pg.sort_date,
+        COALESCE(c.created_at, n.created_at, pt.created_at),
+        COALESCE(c.likes_count, n.likes_count, pt.likes_count),
+        COALESCE(c.comments_count, n.comments_count, pt.comments_count),
+        (lk.id IS NOT NULL),
+        -- Clusters don't have a direct owner
+        COALESCE(COALESCE(n.user_id, pt.user_id) = p_user_id, FALSE),
+        -- Cluster title, or note title (title_clarified, sinon contenu tronqué à 80)
+        COALESCE(
+            c.title,
+            NULLIF(n.title_clarified, ''),
+            CASE WHEN n.id IS NOT NULL THEN
+                LEFT(COALESCE(n.content_clarified, n.content_raw, ''), 80) ||
+                CASE WHEN char_length(COALESCE(n.content_clarified, n.content_raw, '')) > 80
+                    THEN '...' ELSE '' END
+            END
+        )::TEXT,
+        c.note_count,
+        c.velocity_score,
+        c.last_updated_at,
+        CASE WHEN pg.item_type = 'CLUSTER' THEN (
+            SELECT jsonb_agg(note_preview ORDER BY note_preview->>'created_at' DESC)
+            FROM (
+                SELECT jsonb_build_object(
+                    'id', pn.id,
+                    'content', COALESCE(pn.content_clarified, pn.content_raw),
+                    'user_id', pn.user_id,
+                    'created_at', pn.created_at
+                ) AS note_preview
+                FROM notes pn
+                WHERE pn.cluster_id = pg.id
+                AND pn.status IN ('processed', 'review', 'approved', 'refused', 'archived')
+                ORDER BY pn.created_at DESC
+                LIMIT 3
+            ) sub
+        ) END,
+        -- Note-specific (content partagé avec les posts)
+        COALESCE(n.content_clarified, n.content_raw, pt.content)::TEXT,
+        n.content_raw::TEXT,
+        n.content_clarified::TEXT,
+        n.title_clarified::TEXT,
+        n.status::TEXT,
+        n.cluster_id,
+        n.ai_relevance_score,
+        n.processed_at,
+        COALESCE(n.user_id, pt.user_id),
+        -- Post-specific
+        pt.post_type::TEXT,
+        pt.media_urls,
+        COALESCE(pt.metadata->>'has_poll' = 'true', FALSE),
+        COALESCE(pt.saves_count, 0),
+        COALESCE(pt.shares_count, 0),
+        COALESCE(pt.virality_score, 0.0)::FLOAT,
+        (sv.id IS NOT NULL),
+        CASE WHEN u.id IS NOT NULL THEN jsonb_build_object(
+            'first_name', u.first_name,
+            'last_name', u.last_name,
+            'email', u.email,
+            'avatar_url', u.avatar_url
+        ) END,
+        -- Pillar info (NULL for posts)
+        COALESCE(c.pillar_id, n.pillar_id),
+        pl.name::TEXT,
+        pl.color::TEXT
+    FROM page pg
+    LEFT JOIN clusters c ON pg.item_type = 'CLUSTER' AND c.id = pg.id
+    LEFT JOIN notes n ON pg.item_type = 'NOTE' AND n.id = pg.id
+    LEFT JOIN posts pt ON pg.item_type = 'POST' AND pt.id = pg.id
+    LEFT JOIN pillars pl ON pl.id = COALESCE(c.pillar_id, n.pillar_id)
+    LEFT JOIN users u ON u.id = pt.user_id
+    LEFT JOIN liked lk ON lk.item_type = pg.item_type AND lk.id = pg.id
+    LEFT JOIN saved sv ON pg.item_type = 'POST' AND sv.id = pg.id
+    ORDER BY pg.total_score DESC, pg.sort_date DESC;
+
+END;
+$$ LANGUAGE plpgsql STABLE PARALLEL SAFE;
+
+GRANT EXECUTE ON FUNCTION get_unified_feed_optimized TO anon;
+GRANT EXECUTE ON FUNCTION get_unified_feed_optimized TO authenticated;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,29 @@
+-- Migration: Add avatar_path column to users
+-- Description: Storage path of the avatar in the 'avatars' bucket, stored next to
+-- avatar_url so DELETE /users/me/avatar no longer parses the public URL
+-- Execute this in your Supabase SQL Editor
+
+-- ============================================
+-- 1. ADD AVATAR PATH COLUMN
+-- ============================================
+ALTER TABLE users
+ADD COLUMN IF NOT EXISTS avatar_path TEXT;
+
+COMMENT ON COLUMN users.avatar_path IS 'Object path of the avatar in the avatars storage bucket ({user_id}/{uuid}.{ext})';
+
+-- ============================================
+-- 2. BACKFILL FROM EXISTING PUBLIC URLS
+-- ============================================
+-- .../storage/v1/object/public/avatars/{path}[?...] -> {path}
+UPDATE users
+SET avatar_path = split_part(split_part(avatar_url, '/avatars/', 2), '?', 1)
+WHERE avatar_path IS NULL
+  AND avatar_url LIKE '%/avatars/%';
+
+-- ============================================
+-- 3. VERIFY SETUP
+-- ============================================
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'users'
+AND column_name = 'avatar_path';
@@ -0,0 +1,133 @@
+-- ============================================
+-- VIRALITY LISTEN/NOTIFY
+-- Les écritures d'engagement émettent pg_notify('virality', post_id)
+-- Un consumer Python (ViralityListener) regroupe les post_id et appelle
+-- recalc_virality_batch() toutes les 500 ms: un recalcul par post et par fenêtre
+-- ============================================
+
+-- ============================================
+-- 1. NOTIFY TRIGGERS
+-- ============================================
+
+CREATE OR REPLACE FUNCTION notify_virality_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'posts' THEN
+        PERFORM pg_notify('virality', NEW.id::TEXT);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('virality', OLD.post_id::TEXT);
+    ELSE
+        PERFORM pg_notify('virality', NEW.post_id::TEXT);
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    ELSE
+        RETURN NEW;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Nouveau post: score initial (Cold Start boost)
+DROP TRIGGER IF EXISTS trigger_virality_notify_posts ON posts;
+CREATE TRIGGER trigger_virality_notify_posts
+AFTER INSERT ON posts
+FOR EACH ROW EXECUTE FUNCTION notify_virality_change();
+
+DROP TRIGGER IF EXISTS trigger_virality_notify_likes ON post_likes;
+CREATE TRIGGER trigger_virality_notify_likes
+AFTER INSERT OR DELETE ON post_likes
+FOR EACH ROW EXECUTE FUNCTION notify_virality_change();
+
+DROP TRIGGER IF EXISTS trigger_virality_notify_saves ON post_saves;
+CREATE TRIGGER trigger_virality_notify_saves
+AFTER INSERT OR DELETE ON post_saves
+FOR EACH ROW EXECUTE FUNCTION notify_virality_change();
+
+DROP TRIGGER IF EXISTS trigger_virality_notify_comments ON post_comments;
+CREATE TRIGGER trigger_virality_notify_comments
+AFTER INSERT OR DELETE ON post_comments
+FOR EACH ROW EXECUTE FUNCTION notify_virality_change();
+
+
+-- ============================================
+-- 2. BATCH RECALC (même algorithme que calculate_virality_score_task)
+-- ============================================
+
+DROP FUNCTION IF EXISTS recalc_virality_batch;
+
+CREATE OR REPLACE FUNCTION recalc_virality_batch(p_post_ids UUID[])
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INT;
+BEGIN
+    WITH scored AS (
+        -- Engagement (like 1, comment 3, share 5, save 10) + Cold Start boost (50 si < 2h)
+        SELECT
+            p.id,
+            (
+                COALESCE(p.likes_count, 0) * 1 +
+                COALESCE(p.comments_count, 0) * 3 +
+                COALESCE(p.shares_count, 0) * 5 +
+                COALESCE(p.saves_count, 0) * 10 +
+                CASE WHEN p.created_at > NOW() - INTERVAL '2 hours' THEN 50 ELSE 0 END
+            )::FLOAT AS score
+        FROM posts p
+        WHERE p.id = ANY(p_post_ids)
+          -- Time decay: posts > 7 jours ignorés, sauf engagement < 24h (Necromancy)
+          AND (
+              p.created_at > NOW() - INTERVAL '7 days'
+              OR p.last_engagement_at > NOW() - INTERVAL '24 hours'
+          )
+    ),
+    leveled AS (
+        SELECT
+            id,
+            score,
+            CASE
+                WHEN score >= 10000 THEN 'global'
+                WHEN score >= 2000 THEN 'national'
+                WHEN score >= 500 THEN 'viral'
+                WHEN score >= 100 THEN 'trending'
+                ELSE 'local'
+            END AS level,
+            CASE
+                WHEN score >= 10000 THEN 5.0
+                WHEN score >= 2000 THEN 3.0
+                WHEN score >= 500 THEN 2.0
+                WHEN score >= 100 THEN 1.5
+                ELSE 1.0
+            END AS multiplier
+        FROM scored
+    ),
+    updated AS (
+        UPDATE posts p SET
+            virality_score = l.score * l.multiplier,
+            virality_level = l.level,
+            updated_at = NOW()
+        FROM leveled l
+        WHERE p.id = l.id
+        RETURNING p.id
+    )
+    SELECT COUNT(*) INTO v_count FROM updated;
+
+    -- Trend score des tags touchés = moyenne des virality_scores de leurs posts
+    UPDATE tags t SET
+        trend_score = sub.trend_score,
+        updated_at = NOW()
+    FROM (
+        SELECT pt.tag_id, COALESCE(AVG(p.virality_score), 0) AS trend_score
+        FROM post_tags pt
+        JOIN posts p ON p.id = pt.post_id
+        WHERE pt.tag_id IN (
+            SELECT tag_id FROM post_tags WHERE post_id = ANY(p_post_ids)
+        )
+        GROUP BY pt.tag_id
+    ) sub
+    WHERE t.id = sub.tag_id;
+
+    RETURN v_count;
+END;
+$$;
@@ -0,0 +1,48 @@
+-- ============================================
+-- MATERIALIZED v_feed_stats
+-- La vue recalculait les agrégats sur toutes les notes de l'organisation à
+-- chaque lecture (feed unifié + /feed/unified/stats). Elle devient une vue
+-- matérialisée rafraîchie en tâche de fond (Celery beat: refresh_feed_stats)
+-- Même nom et mêmes colonnes: aucun changement côté API
+-- ============================================
+
+DROP VIEW IF EXISTS v_feed_stats;
+DROP MATERIALIZED VIEW IF EXISTS v_feed_stats;
+
+CREATE MATERIALIZED VIEW v_feed_stats AS
+SELECT
+    organization_id,
+    COUNT(*) FILTER (WHERE cluster_id IS NULL) AS orphan_notes_count,
+    COUNT(*) FILTER (WHERE cluster_id IS NOT NULL) AS clustered_notes_count,
+    COUNT(DISTINCT cluster_id) AS active_clusters_count,
+    MAX(created_at) AS last_note_at
+FROM notes
+WHERE status = 'processed'
+GROUP BY organization_id;
+
+-- Requis par REFRESH ... CONCURRENTLY (les lectures ne sont pas bloquées)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_v_feed_stats_org
+ON v_feed_stats(organization_id);
+
+COMMENT ON MATERIALIZED VIEW v_feed_stats IS 'Statistiques du feed par organisation (notes orphelines, clustérisées, clusters actifs) - rafraîchie par refresh_feed_stats()';
+
+GRANT SELECT ON v_feed_stats TO authenticated;
+
+-- ============================================
+-- REFRESH
+-- ============================================
+
+DROP FUNCTION IF EXISTS refresh_feed_stats;
+
+CREATE OR REPLACE FUNCTION refresh_feed_stats()
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY v_feed_stats;
+END;
+$$;
+
+-- Refresh PostgREST schema cache
+NOTIFY pgrst, 'reload schema';
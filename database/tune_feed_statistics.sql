@@ -0,0 +1,21 @@
+-- ============================================
+-- FEED PLANNER STATISTICS
+-- La répartition des lignes par organisation est très inégale: avec la cible
+-- par défaut (100), le planner sous-estime les grosses organisations et choisit
+-- de mauvais plans pour get_unified_feed_optimized. Échantillon plus large sur
+-- les colonnes filtrées par le feed, puis ré-analyse
+-- ============================================
+
+ALTER TABLE notes ALTER COLUMN organization_id SET STATISTICS 500;
+ALTER TABLE notes ALTER COLUMN cluster_id SET STATISTICS 500;
+ALTER TABLE notes ALTER COLUMN status SET STATISTICS 500;
+
+ALTER TABLE clusters ALTER COLUMN organization_id SET STATISTICS 500;
+ALTER TABLE clusters ALTER COLUMN note_count SET STATISTICS 500;
+
+ALTER TABLE posts ALTER COLUMN organization_id SET STATISTICS 500;
+ALTER TABLE posts ALTER COLUMN post_type SET STATISTICS 500;
+
+ANALYZE notes;
+ANALYZE clusters;
+ANALYZE posts;